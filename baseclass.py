@@ -98,7 +98,7 @@ class Driver(object, metaclass=ABCMeta):
         """
         Writes object to disk at location specified in directory
         :param kumo_obj: An object to write, containing originating service, file_name, start and end revision,
-        as well as content and object type. 
+        as well as content and object type.  Content may also be a function that writes itself to a text file.
         :param base_path: Directory in which kumo_obj will be written.
         :return: None
         """
@@ -108,6 +108,10 @@ class Driver(object, metaclass=ABCMeta):
         self.logger.debug('Writing {} to disk at location {}'.format(kumo_obj.filename, outfile))
 
         try:
+            if callable(kumo_obj.content):
+                with open(outfile, 'w', encoding='utf-8', newline='') as f:
+                    kumo_obj.content(f)
+                return
             with open(outfile, 'wb') as f:
                 # Ensure content is bytes for binary write mode
                 content = kumo_obj.content
@@ -121,6 +125,9 @@ class Driver(object, metaclass=ABCMeta):
 class Parser(object, metaclass=ABCMeta):
     """ Specific parsers implement parse() and return a list of KumoObj """
 
+    # name of the option that enables an optional parser, which collect_parsers leaves out, see enable_parsers
+    option = None
+
     def __init__(self, client, delimiter='|'):
         self.KumoObj = Handler.KumoObj
         self.client = client
@@ -141,6 +148,17 @@ class Parser(object, metaclass=ABCMeta):
         :return: List of KumoObj retrieved from logs
         """
 
+    # override to take part in the single walk over flat_log
+    def visitor(self, log, choice):
+        """
+        Returns a callable that receives each flat_log line during Handler.visit_flat_log, so that state needed by
+        parse() can be collected without walking flat_log again.
+        :param log: Revision log
+        :param choice: Package-level constant that encapsulates info necessary to parse
+        :return: Callable taking a single FlatRecord, or None if the parser does not visit flat_log
+        """
+        return None
+
 
 class Handler(object, metaclass=ABCMeta):
     """  Base class for service handlers to inherit.  Any Handler that inherits from this base class should add the
@@ -185,6 +203,23 @@ class Handler(object, metaclass=ABCMeta):
             else:
                 raise StopIteration
 
+    class FlatRecord(namedtuple('FlatRecord', 'info action_type action')):
+        """ A single entry of the flat (common) log:
+        param tuple info: Leading columns of the entry, such as (timestamp, uid, rev, ...) for a changelog entry
+        param str action_type: Descriptive action type, or None for entries without one
+        param dict action: Action dictionary with descriptive keys
+        """
+
+        __slots__ = ()
+
+        def join(self, delimiter):
+            """ Returns the entry as delimiter-separated text with the action dictionary as last element """
+            columns = [str(col) for col in self.info]
+            if self.action_type is not None:
+                columns.append(self.action_type)
+            columns.append(json.dumps(self.action))
+            return delimiter.join(columns)
+
     @property
     @abstractmethod
     def logger(self):
@@ -213,16 +248,20 @@ class Handler(object, metaclass=ABCMeta):
         """ Override to provide extra args to parsers """
         return {}
 
+    def visitor(self, log, choice):
+        """ Override to collect handler state, such as parser_opts, during the single walk over flat_log """
+        return None
+
     def parse_log(self, log):
         """
         Override with service-specific requirements
-        :return: Must return a list of lines parsed from self.log
+        :return: Must return a list of FlatRecord parsed from self.log
         """
         return []
 
     def parse_snapshot(self, log):
         """ Override with service-specific requirements
-        :return: Must return a list of lines parsed from self.log
+        :return: Must return a list of FlatRecord parsed from self.log
         """
         return []
 
@@ -238,10 +277,21 @@ class Handler(object, metaclass=ABCMeta):
         def logger(self):
             return None
 
+        def __init__(self, client, delimiter='|'):
+            super(Handler.FlatParser, self).__init__(client, delimiter)
+            self._lines = None
+
+        def visitor(self, log, choice):
+            self._lines = []
+            return lambda line: self._lines.append(line.join(self.delimiter))
+
         def parse(self, log, flat_log, choice, **kwargs):
+            lines, self._lines = self._lines, None
             if flat_log:
                 filename = 'flat_log.txt'
-                content = '\n'.join(str(line) for line in flat_log).encode('utf-8')
+                if lines is None:
+                    lines = [line.join(self.delimiter) for line in flat_log]
+                content = '\n'.join(lines).encode('utf-8')
                 return [self.KumoObj(filename=filename, content=content)]
             else:
                 return []
@@ -255,6 +305,9 @@ class Handler(object, metaclass=ABCMeta):
 
         def parse(self, log, flat_log, choice, **kwargs):
             filename = 'revision-log.txt'
+            if hasattr(log, 'dump'):
+                # a streamed log writes the same text as stringify, one changelog entry at a time
+                return [self.KumoObj(filename=filename, content=lambda f: log.dump(f, indent=1))]
             content = Handler.stringify(log).encode('utf-8')
             return [self.KumoObj(filename=filename, content=content)]
 
@@ -262,13 +315,21 @@ class Handler(object, metaclass=ABCMeta):
     def collect_parsers(self, mod_name):
         """ Collects any class ending in `Parser` as well as self.LogParser and self.FlatParser"""
         p = [self.LogParser, self.FlatParser]
-        p.extend(cls for name, cls in filter(is_parser, inspect.getmembers(sys.modules[mod_name])))
+        p.extend(cls for name, cls in filter(is_parser, inspect.getmembers(sys.modules[mod_name]))
+                 if cls.option is None)
         return p
 
+    def enable_parsers(self, options):
+        """ Adds each optional parser of the handler's module whose option is in options """
+        enabled = set(type(parser) for parser in self.parsers)
+        for name, cls in filter(is_parser, inspect.getmembers(sys.modules[type(self).__module__])):
+            if cls.option is not None and cls.option in options and cls not in enabled:
+                self.parsers.append(self.init_parser(cls))
+
     def flatten_log(self, log):
         """
         Splits self.log into snapshot and changelog, parses each, and returns flat_log
-        :return: A 1-D log separated by self.delimiter containing action dictionary as last element
+        :return: A 1-D list of Handler.FlatRecord, each containing its action dictionary as last element
         """
         flat_log = []
         try:
@@ -284,10 +345,26 @@ class Handler(object, metaclass=ABCMeta):
         """ Initializes each parser with the required attributes """
         return parser(self.client)
 
+    def visit_flat_log(self, log, flat_log, choice):
+        """
+        Walks flat_log exactly once, sending each line to the visitor of the handler and of every parser
+        :return: None; each visitor keeps the state it collected
+        """
+        visitors = [self.visitor(log, choice)]
+        visitors.extend(p.visitor(log, choice) for p in self.parsers)
+        visitors = [v for v in visitors if v is not None]
+
+        if visitors and flat_log:
+            for line in flat_log:
+                for visit in visitors:
+                    visit(line)
+
     def recover_objects(self, log, flat_log, choice):
-        """ Runs parse() for each parser in self.parser to recover objects from log and flat_log.
+        """ Walks flat_log once for all visitors, then runs parse() for each parser in self.parser to recover
+        objects from log and flat_log.
         :return: A list of recovered KumoObj
         """
+        self.visit_flat_log(log, flat_log, choice)
         opt_args = self.parser_opts(log, flat_log, choice)
         objects = list(itertools.chain.from_iterable(p.parse(log, flat_log, choice, **opt_args) for p in self.parsers))
 
@@ -0,0 +1,105 @@
+"""
+Benchmarks each stage of the Docs and Slides pipelines on synthetic revision logs, reporting throughput in changelog
+entries per second and peak memory per stage.  Run from the repository root:
+
+    python -m benchmarks.run --revisions 20000
+"""
+import copy
+import sys
+import time
+import tracemalloc
+
+import click
+
+from benchmarks import synthetic
+from gsuite.docshandler import DocsHandler, PlaintextParser
+from gsuite.slideshandler import Presentation
+
+
+def parse_mix(value):
+    """ Parses an edit mix such as insert=6,delete=2 into a dictionary of weights """
+    if not value:
+        return None
+    try:
+        return {name: float(weight) for name, weight in (item.split('=') for item in value.split(','))}
+    except ValueError:
+        raise click.BadParameter('expected name=weight[,name=weight...]')
+
+
+def measure(func, *args, setup=None):
+    """
+    Runs func once for time and once under tracemalloc for peak memory, since tracing slows it down
+    :param setup: Optional function returning fresh args for each run, called before timing or tracing starts
+    :return: Tuple (result, seconds, peak bytes)
+    """
+    run_args = setup() if setup else args
+    began = time.perf_counter()
+    result = func(*run_args)
+    elapsed = time.perf_counter() - began
+
+    run_args = setup() if setup else args
+    tracemalloc.start()
+    try:
+        func(*run_args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def flatten(log):
+    return DocsHandler(client=None).flatten_log(log)
+
+
+def doc_objects(flat_log):
+    return DocsHandler(client=None).get_doc_objects(flat_log)
+
+
+def docs_stages(log):
+    """ Yields (stage, seconds, peak bytes) for each Docs stage """
+    # flatten_log modifies the snapshot of the log it is given, so each run gets its own copy
+    flat_log, elapsed, peak = measure(flatten, setup=lambda: (copy.deepcopy(log),))
+    yield 'DocsHandler.flatten_log', elapsed, peak
+    for name, func in (('PlaintextParser.get_plain_text', PlaintextParser.get_plain_text),
+                       ('DocsHandler.get_doc_objects', doc_objects)):
+        _, elapsed, peak = measure(func, flat_log)
+        yield name, elapsed, peak
+
+
+def slides_stages(log):
+    """ Yields (stage, seconds, peak bytes) for each Slides stage """
+    _, elapsed, peak = measure(Presentation, log)
+    yield 'Presentation', elapsed, peak
+
+
+def report(service, entries, stages):
+    for stage, elapsed, peak in stages:
+        print('{:<8}{:<34}{:>10}{:>12.3f}{:>14,.0f}{:>12.1f}'.format(service, stage, entries, elapsed,
+                                                                        entries / max(elapsed, 1e-9), peak / 2 ** 20))
+
+
+@click.command(context_settings=dict(help_option_names=['-h', '--help']))
+@click.option('--service', type=click.Choice(['docs', 'slides', 'all']), default='all')
+@click.option('--revisions', type=click.IntRange(min=1), default=10000, help='Changelog entries per log')
+@click.option('--mix', default=None, help='Relative edit weights, e.g. insert=6,delete=2,style=1,element=1 for '
+                                          'Docs or insert=6,delete=2,box=1,slide=1 for Slides')
+@click.option('--mts-depth', type=click.IntRange(min=1), default=2, help='Deepest nesting of Docs multisets')
+@click.option('--mts-rate', type=click.FloatRange(0, 1), default=0.2, help='Fraction of entries that are multisets')
+@click.option('--suggestion-rate', type=click.FloatRange(0, 1), default=0.05,
+              help='Fraction of Docs inserts and deletes made as suggestions')
+@click.option('--seed', type=int, default=0)
+def cli(service, revisions, mix, mts_depth, mts_rate, suggestion_rate, seed):
+    edit_mix = parse_mix(mix)
+    print('{:<8}{:<34}{:>10}{:>12}{:>14}{:>12}'.format('service', 'stage', 'entries', 'seconds', 'entries/s',
+                                                      'peak MiB'))
+    if service in ('docs', 'all'):
+        log = synthetic.docs_log(revisions=revisions, edit_mix=edit_mix, mts_depth=mts_depth, mts_rate=mts_rate,
+                                 suggestion_rate=suggestion_rate, seed=seed)
+        report('docs', revisions, docs_stages(log))
+    if service in ('slides', 'all'):
+        log = synthetic.slides_log(revisions=revisions, edit_mix=edit_mix, mts_rate=mts_rate, seed=seed)
+        report('slides', revisions, slides_stages(log))
+
+
+if __name__ == '__main__':
+    cli(sys.argv[1:])
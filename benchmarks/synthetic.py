@@ -0,0 +1,210 @@
+"""Synthetic Docs and Slides revision logs of configurable size and shape, for benchmarks and tests. """
+import random
+
+DOCS_MIX = {'insert': 0.6, 'delete': 0.25, 'style': 0.1, 'element': 0.05}
+SLIDES_MIX = {'insert': 0.6, 'delete': 0.25, 'box': 0.1, 'slide': 0.05}
+UIDS = ('03651744254882927717', '11842637457104952046', '07254108347263710023')
+SID = '76bc479d56ea8803'
+START_TIME = 1500732914567
+WORDS = ('the', 'revision', 'log', 'of', 'a', 'document', 'records', 'every', 'edit', 'kumo', '\n')
+
+
+class DocsLogGenerator(object):
+    """
+    Builds a Docs revision log in the format returned by the revisions/load endpoint.  Indices in every action stay
+    within the document as it would be at that revision, so replaying the log exercises the same paths as a real one.
+    """
+
+    def __init__(self, revisions=1000, edit_mix=None, mts_depth=2, mts_rate=0.2, suggestion_rate=0.05,
+                 snapshot_chars=1000, seed=0):
+        """
+        :param revisions: Number of changelog entries
+        :param edit_mix: Dictionary of relative weights for insert, delete, style, and element actions
+        :param mts_depth: Deepest nesting of multisets
+        :param mts_rate: Fraction of entries that are multisets
+        :param suggestion_rate: Fraction of inserts and deletes made as suggestions
+        :param snapshot_chars: Length of the text in the chunkedSnapshot
+        :param seed: Random seed, the same arguments and seed always give the same log
+        """
+        self.revisions = revisions
+        self.edit_mix = edit_mix or DOCS_MIX
+        self.mts_depth = mts_depth
+        self.mts_rate = mts_rate
+        self.suggestion_rate = suggestion_rate
+        self.snapshot_chars = snapshot_chars
+        self.rand = random.Random(seed)
+        self.length = 0
+        self.suggestions = {}
+        self.counter = 0
+
+    def generate(self):
+        snapshot_text = self.text(self.snapshot_chars)
+        self.length = len(snapshot_text)
+        snapshot = [{'ty': 'is', 'ibi': 1, 's': snapshot_text}] if snapshot_text else []
+        snapshot.append({'si': 0, 'ei': max(1, self.length), 'st': 'text', 'ty': 'as', 'sm': {'ts_ff': 'Arial'}})
+
+        changelog = []
+        for rev in range(1, self.revisions + 1):
+            if self.rand.random() < self.mts_rate:
+                action = self.multiset(self.rand.randint(1, max(1, self.mts_depth)))
+            else:
+                action = self.action()
+            uid = self.rand.choice(UIDS)
+            changelog.append([action, START_TIME + rev * 1000, uid, rev, SID, rev, None])
+
+        return {'chunkedSnapshot': [snapshot], 'changelog': changelog}
+
+    def next_id(self, prefix):
+        self.counter += 1
+        return '{}{:x}'.format(prefix, self.counter)
+
+    def text(self, chars):
+        words = []
+        while chars > 0:
+            word = self.rand.choice(WORDS)
+            words.append(word)
+            chars -= len(word) + 1
+        return ' '.join(words)
+
+    def multiset(self, depth):
+        actions = []
+        for _ in range(self.rand.randint(2, 5)):
+            if depth > 1 and self.rand.random() < 0.3:
+                actions.append(self.multiset(depth - 1))
+            else:
+                actions.append(self.action())
+        return {'mts': actions, 'ty': 'mlti'}
+
+    def action(self):
+        kind = self.rand.choices(list(self.edit_mix), weights=list(self.edit_mix.values()))[0]
+        if kind == 'delete' and self.length > 1:
+            return self.delete()
+        elif kind == 'style' and self.length > 1:
+            return self.style()
+        elif kind == 'element':
+            return self.element()
+        return self.insert()
+
+    def insert(self):
+        string = self.text(self.rand.randint(1, 12))
+        index = self.rand.randint(1, self.length + 1)
+        self.length += len(string)
+        if self.rand.random() >= self.suggestion_rate:
+            return {'ibi': index, 's': string, 'ty': 'is'}
+
+        if self.suggestions and self.rand.random() < 0.5:
+            # extend an open suggestion, inside its range
+            sug_id = self.rand.choice(list(self.suggestions))
+            start, end = self.suggestions[sug_id]
+            index = self.rand.randint(start, end + 1)
+            self.suggestions[sug_id] = (start, end + len(string))
+        else:
+            sug_id = self.next_id('suggest.')
+            self.suggestions[sug_id] = (index, index + len(string) - 1)
+        return {'sugid': sug_id, 's': string, 'ibi': index, 'ty': 'iss'}
+
+    def delete(self):
+        if self.suggestions and self.rand.random() < self.suggestion_rate:
+            sug_id = self.rand.choice(list(self.suggestions))
+            start, end = self.suggestions[sug_id]
+            if start <= end <= self.length:
+                si = self.rand.randint(start, end)
+                ei = self.rand.randint(si, min(end, si + 8))
+                self.suggestions[sug_id] = (start, end - (ei - si + 1))
+                self.length -= ei - si + 1
+                return {'si': si, 'ei': ei, 'ty': 'dss'}
+
+        si = self.rand.randint(1, self.length)
+        ei = self.rand.randint(si, min(self.length, si + 20))
+        self.length -= ei - si + 1
+        return {'si': si, 'ei': ei, 'ty': 'ds'}
+
+    def style(self):
+        si = self.rand.randint(1, self.length)
+        ei = self.rand.randint(si, self.length)
+        style = self.rand.choice(({'ts_bd': True, 'ts_bd_i': False}, {'ts_it': True, 'ts_it_i': False},
+                                  {'ts_fs': 14.0, 'ts_fs_i': False}, {'ts_fgc': '#ff0000', 'ts_fgc_i': False}))
+        return {'si': si, 'st': 'text', 'ei': ei, 'sm': style, 'ty': 'as'}
+
+    def element(self):
+        """ Inserts an inline image or drawing, as a multiset of the placeholder character and the element """
+        index = self.rand.randint(1, self.length + 1)
+        self.length += 1
+        element_id = self.next_id('kix.')
+        if self.rand.random() < 0.5:
+            embedded = {'eo_type': 0, 'i_cid': self.next_id('cosmo'), 'i_wth': 200.0, 'i_ht': 100.0}
+        else:
+            embedded = {'eo_type': 2, 'd_id': self.next_id('drawing'), 'i_wth': 433.5, 'i_ht': 51.75}
+        return {'mts': [{'ibi': index, 's': '*', 'ty': 'is'},
+                        {'et': 'inline', 'epm': {'ee_eo': embedded}, 'id': element_id, 'ty': 'ae'},
+                        {'spi': index, 'id': element_id, 'ty': 'te'}], 'ty': 'mlti'}
+
+
+class SlidesLogGenerator(object):
+    """ Builds a Slides revision log of slides, text boxes, and text edits in the format read by Presentation """
+
+    def __init__(self, revisions=1000, edit_mix=None, mts_rate=0.1, seed=0):
+        """
+        :param revisions: Number of changelog entries
+        :param edit_mix: Dictionary of relative weights for insert, delete, box, and slide actions
+        :param mts_rate: Fraction of entries that are multisets
+        :param seed: Random seed, the same arguments and seed always give the same log
+        """
+        self.revisions = revisions
+        self.edit_mix = edit_mix or SLIDES_MIX
+        self.mts_rate = mts_rate
+        self.rand = random.Random(seed)
+        self.slides = ['p']
+        self.boxes = {'i0': 0, 'i1': 0, 'i3': 0}
+        self.box_slides = {'i0': 'p', 'i1': 'p', 'i3': 'p'}
+        self.counter = 0
+
+    def generate(self):
+        changelog = [[[12, 'p', 0], START_TIME, UIDS[0], 1, SID, 1, None]]  # skipped by Presentation
+        for rev in range(2, self.revisions + 2):
+            if self.rand.random() < self.mts_rate:
+                action = [4, [self.action() for _ in range(self.rand.randint(2, 5))]]
+            else:
+                action = self.action()
+            changelog.append([action, START_TIME + rev * 1000, self.rand.choice(UIDS), rev, SID, rev, None])
+        return {'changelog': changelog}
+
+    def next_id(self, prefix):
+        self.counter += 1
+        return '{}{:x}'.format(prefix, self.counter)
+
+    def action(self):
+        kind = self.rand.choices(list(self.edit_mix), weights=list(self.edit_mix.values()))[0]
+        if kind == 'slide':
+            slide_id = self.next_id('g')
+            index = self.rand.randint(0, len(self.slides))
+            self.slides.insert(index, slide_id)
+            return [12, slide_id, index]
+        elif kind == 'box':
+            box_id = self.next_id('b')
+            slide_id = self.rand.choice(self.slides)
+            self.boxes[box_id] = 0
+            self.box_slides[box_id] = slide_id
+            return [3, box_id, 0, None, None, slide_id]
+
+        box_id = self.rand.choice(list(self.boxes))
+        length = self.boxes[box_id]
+        if kind == 'delete' and length:
+            start = self.rand.randint(0, length - 1)
+            end = self.rand.randint(start + 1, min(length, start + 20))
+            self.boxes[box_id] -= end - start
+            return [16, box_id, 0, start, end]
+
+        string = ' '.join(self.rand.choice(WORDS) for _ in range(self.rand.randint(1, 3)))
+        self.boxes[box_id] += len(string)
+        return [15, box_id, 0, self.rand.randint(0, length), string]
+
+
+def docs_log(**kwargs):
+    """ Returns a synthetic Docs revision log, see DocsLogGenerator for arguments """
+    return DocsLogGenerator(**kwargs).generate()
+
+
+def slides_log(**kwargs):
+    """ Returns a synthetic Slides revision log, see SlidesLogGenerator for arguments """
+    return SlidesLogGenerator(**kwargs).generate()
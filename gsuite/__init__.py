@@ -7,12 +7,30 @@ REV_PARAMS = 'revisions/load?start={start}&end={end}'
 RENDER_PARAMS = 'renderdata?id={file_id}'
 LOG_DRIVE = {'document': 'document', 'spreadsheet': 'spreadsheets', 'drawing': 'drawings',
              'presentation': 'presentation', 'form': 'forms'}
+MIME_PREFIX = 'application/vnd.google-apps.'
 MIME_TYPE = "mimeType = 'application/vnd.google-apps.{drive_type}'"
 CAN_EDIT = "'{email}' in writers"
 Q_PARAM = '{0} and {1}'.format(MIME_TYPE, CAN_EDIT)
 DRAW_PARAMS = 'image?w={w}&h={h}'
 CHUNKED_ORDER = ['si', 'ei', 'st']
 LOG_START_CHR = ")]}'\n"
+MAX_WORKERS = 8  # concurrent requests at the start of a run, then adapted by the client's ConcurrencyLimiter
+DRAWING_TIMEOUT = 60  # seconds before a single drawing download is abandoned
+HTTP_POOL_SIZE = 16  # authorized connections kept open by each Client, shared by all of its threads
+RETRY_ATTEMPTS = 5  # retries of a single request after a 429, a 5xx, or a connection error
+RETRY_BUDGET = 500  # retries allowed across every request of a Client, so a failing service cannot stall a run
+RETRY_DELAY = (0.5, 60)  # first and largest backoff delay in seconds, also the longest Retry-After honored
+LOG_CHUNK_REVS = 500  # revisions requested per chunk when downloading a Docs log, adapted as chunks arrive
+LOG_CHUNK_BOUNDS = (50, 20000)  # smallest and largest chunk in revisions
+LOG_CHUNK_SECONDS = 10  # target download time for a single chunk
+LOG_CHUNK_BYTES = 2 ** 24  # target response size for a single chunk
+LOG_CACHE_DIR = 'cache'  # relative to the kumodocs working directory
+LOG_CACHE_SIZE = 2 ** 30  # bytes of compressed logs kept before least recently used logs are evicted
+FLAT_CACHE_DIR = 'cache/flat'  # saved flat logs resumed by --incremental, relative to the working directory
+BLOB_CACHE_DIR = 'cache/blobs'  # downloaded images and drawings, relative to the working directory
+BLOB_CACHE_SIZE = 2 ** 30  # bytes of images and drawings kept before least recently used ones are evicted
+BLOB_LOCK_TIMEOUT = 120  # seconds another process may spend downloading an image or drawing before it is retried
+CHECKPOINT_REVS = 100  # revisions between stored text checkpoints when replaying a Docs log by revision
 
 # package-level named tuples
 FileChoice = namedtuple('FileChoice', 'file_id, title, drive, max_revs')
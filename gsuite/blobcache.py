@@ -0,0 +1,278 @@
+"""On-disk cache of downloaded images and drawings, stored once by content hash and shared across documents. """
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+import uuid
+
+import KIOutils
+import gsuite
+
+logger = logging.getLogger(__name__)
+
+
+class BlobCache(object):
+    """
+    Maps keys such as ('image', img_id) or ('drawing', d_id, width, height) to downloaded content.  Each content is
+    written once to blobs/ under its sha256 digest, and each key is a small record in keys/ naming the digest and the
+    file extension.  Reading a key marks its blob as recently used, and writing evicts the least recently used blobs
+    once their total size grows beyond max_bytes.
+
+    fetch_all downloads each missing key once across every thread and process sharing cache_dir: the caller that
+    creates the lock file of a key in locks/ downloads it, and the others wait for the lock to go away and read the
+    result from the cache.
+    """
+
+    def __init__(self, cache_dir, max_bytes, lock_timeout=gsuite.BLOB_LOCK_TIMEOUT):
+        """
+        :param cache_dir: Directory holding blobs/, keys/, and locks/
+        :param max_bytes: Total size of blobs kept before least recently used blobs are evicted
+        :param lock_timeout: Seconds a download may hold its lock before waiters stop waiting and the lock is
+        considered stale
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock_timeout = lock_timeout
+        self.blob_dir = os.path.join(cache_dir, 'blobs')
+        self.key_dir = os.path.join(cache_dir, 'keys')
+        self.lock_dir = os.path.join(cache_dir, 'locks')
+        self._tokens = {}  # key -> token written to each lock file held by this cache
+        self._total = None  # bytes of blobs, counted by the first put and kept up to date by later ones
+
+    @staticmethod
+    def key_name(key):
+        return hashlib.sha256(json.dumps(list(key)).encode('utf-8')).hexdigest()
+
+    def key_path(self, key):
+        return os.path.join(self.key_dir, self.key_name(key) + '.json')
+
+    def lock_path(self, key):
+        return os.path.join(self.lock_dir, self.key_name(key) + '.lock')
+
+    def blob_path(self, digest):
+        return os.path.join(self.blob_dir, digest)
+
+    def get(self, key):
+        """
+        Returns the cached content for key
+        :return: Tuple (content, extension), or None on a cache miss
+        """
+        try:
+            with open(self.key_path(key), encoding='utf-8') as f:
+                record = json.load(f)
+            path = self.blob_path(record['blob'])
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except (IOError, OSError):
+            self._remove(self.key_path(key))  # its blob was evicted
+            return None
+
+        try:
+            os.utime(path, None)  # mark as recently used
+        except OSError:
+            pass
+        return content, record['extension']
+
+    def put(self, key, content, extension):
+        """ Stores content for key, writing the blob only if no other key has stored the same content """
+        digest = hashlib.sha256(content).hexdigest()
+        added = 0
+        try:
+            if not os.path.exists(self.blob_path(digest)):
+                self._write(self.blob_dir, self.blob_path(digest), content)
+                added = len(content)
+            record = json.dumps({'blob': digest, 'extension': extension}).encode('utf-8')
+            self._write(self.key_dir, self.key_path(key), record)
+        except (IOError, OSError):
+            logger.exception('Failed to cache {}'.format(key))
+            return
+
+        if self._total is None:
+            self._total = sum(size for _, size, _ in self.entries())
+        else:
+            self._total += added
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def fetch_all(self, keys, download):
+        """
+        Returns the content of each key, downloading every key that is not cached at most once across the threads
+        and processes sharing the cache.  Keys being downloaded by another caller are waited for, and downloaded
+        here only if that caller did not store them.
+        :param keys: List of keys
+        :param download: Function taking a list of keys and returning a dictionary of key -> (content, extension)
+        for those retrieved.  It stores in the cache whichever results should be shared
+        :return: Dictionary of key -> (content, extension) for every key cached or retrieved
+        """
+        found, claimed, waiting = {}, [], []
+        for key in keys:
+            cached = self.get(key)
+            if cached is not None:
+                found[key] = cached
+            elif self.claim(key):
+                claimed.append(key)
+            else:
+                waiting.append(key)
+
+        try:
+            if claimed:
+                found.update(download(claimed))
+        finally:
+            for key in claimed:
+                self.release(key)
+
+        missing = []
+        for key in waiting:
+            cached = self.wait(key)
+            if cached is None:
+                missing.append(key)
+            else:
+                found[key] = cached
+        if missing:
+            found.update(download(missing))
+        return found
+
+    def claim(self, key):
+        """
+        Creates the lock file of key holding a token of this process and call, or replaces a stale one
+        :return: False if another caller holds the lock
+        """
+        path = self.lock_path(key)
+        token = '{}:{}'.format(os.getpid(), uuid.uuid4().hex)
+        for _ in range(2):
+            try:
+                KIOutils.ensure_path(self.lock_dir)
+                fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                stale_token = self._read_token(path)
+                if not self._stale(path):
+                    return False
+                logger.debug('Removing stale lock {}'.format(path))
+                self._remove_lock(path, stale_token)
+                continue
+            except OSError:
+                logger.debug('Cannot lock {}, downloading without it'.format(key), exc_info=True)
+                return True
+
+            with os.fdopen(fd, 'w') as f:
+                f.write(token)
+            self._tokens[key] = token
+            return True
+        return False
+
+    def release(self, key):
+        """ Removes the lock file of key, unless it was replaced as stale and now belongs to another caller """
+        token = self._tokens.pop(key, None)
+        if token is not None:
+            self._remove_lock(self.lock_path(key), token)
+
+    def _read_token(self, path):
+        try:
+            with open(path) as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _remove_lock(self, path, token):
+        """ Removes the lock file at path if it still holds token """
+        if token is not None and self._read_token(path) == token:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def wait(self, key, poll=0.05):
+        """ Waits until the lock of key is released or stale, then returns get(key) """
+        path = self.lock_path(key)
+        while os.path.exists(path) and not self._stale(path):
+            time.sleep(poll)
+        return self.get(key)
+
+    def _stale(self, path):
+        try:
+            return time.time() - os.stat(path).st_mtime > self.lock_timeout
+        except OSError:
+            return False
+
+    @staticmethod
+    def _write(directory, path, data):
+        KIOutils.ensure_path(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except (IOError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def entries(self):
+        """ Returns a list of (last_used, size, path) for each cached blob """
+        try:
+            names = os.listdir(self.blob_dir)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if not name.endswith('.tmp'):
+                path = os.path.join(self.blob_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """
+        Removes least recently used blobs until the cache fits in max_bytes, along with the key records naming them.
+        Blobs written by other processes are counted here too, which corrects the running total of put.
+        """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        evicted = set()
+        # always keep the most recent blob, even if it alone exceeds max_bytes
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            logger.debug('Evicted {} from blob cache'.format(path))
+            evicted.add(os.path.basename(path))
+            total -= size
+        self._total = total
+        if evicted:
+            self.prune_keys(evicted)
+
+    def prune_keys(self, digests):
+        """ Removes the key records naming any blob in digests """
+        try:
+            names = os.listdir(self.key_dir)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.json'):
+                path = os.path.join(self.key_dir, name)
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        digest = json.load(f).get('blob')
+                except (IOError, OSError, ValueError):
+                    continue
+                if digest in digests:
+                    self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
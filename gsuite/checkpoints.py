@@ -0,0 +1,49 @@
+"""Compressed snapshots of replayed document text, used to rebuild the text at a revision from a nearby checkpoint. """
+import gzip
+import os
+import tempfile
+import zlib
+
+import KIOutils
+
+
+class MemoryCheckpoints(object):
+    """ Keeps each checkpoint text zlib-compressed in memory """
+
+    def __init__(self, level=6):
+        self.level = level
+        self._texts = {}
+
+    def put(self, rev, text):
+        self._texts[rev] = zlib.compress(text.encode('utf-8'), self.level)
+
+    def get(self, rev):
+        return zlib.decompress(self._texts[rev]).decode('utf-8')
+
+
+class DiskCheckpoints(object):
+    """ Writes each checkpoint text gzip-compressed to checkpoint_dir, one file per revision """
+
+    EXT = '.txt.gz'
+
+    def __init__(self, checkpoint_dir):
+        self.checkpoint_dir = checkpoint_dir
+
+    def path(self, rev):
+        return os.path.join(self.checkpoint_dir, '{}{}'.format(rev, self.EXT))
+
+    def put(self, rev, text):
+        KIOutils.ensure_path(self.checkpoint_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=self.checkpoint_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, self.path(rev))
+        except (IOError, OSError):
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def get(self, rev):
+        with gzip.open(self.path(rev), 'rt', encoding='utf-8') as f:
+            return f.read()
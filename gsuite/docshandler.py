@@ -1,17 +1,29 @@
+import bisect
 import cgi
 import json
 import logging
 import os
 import urllib.parse
 from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
+import KIOutils
 import gsuite
 import mappings
 from baseclass import Parser, Handler
+from gsuite.blobcache import BlobCache
+from gsuite.checkpoints import DiskCheckpoints, MemoryCheckpoints
+from gsuite.intervals import IntervalIndex
+from gsuite.piecetable import PieceTable
+from gsuite.revisions import BASE_FILENAME, DIFF_FILENAME, dump_revision
 
 logger = logging.getLogger(__name__)
 
 INDEX_OFFSET = -1
+UID_INDEX = 1  # position of the author in the info of a changelog FlatRecord
+REV_INDEX = 2  # position of the revision in the info of a changelog FlatRecord
+SNAPSHOT_HEADER = Handler.FlatRecord(('chunkedSnapshot',), None, {})
+CHANGELOG_HEADER = Handler.FlatRecord(('changelog',), None, {})
 
 
 def insert(old_string, new_string, index, index_offset):
@@ -28,17 +40,6 @@ def delete(old_string, starting_index, ending_index, index_offset):
     return old_string[:starting_index] + old_string[ending_index:]
 
 
-def get_dict(line):
-    """ converts string dictionary at end of line in log to dictionary object"""
-    i = line.index('{')
-    try:
-        log_dict = json.loads(line[i:])
-    except ValueError:
-        raise  # should not have a line without dictionary
-    else:
-        return log_dict
-
-
 def get_download_ext(html_response):
     """
     Returns extension for downloaded resource as formatted for GSuite API html response
@@ -69,9 +70,36 @@ def create_obj_list(kumo_obj, objects, type_):
     return obj_list
 
 
-def has_drawing(elem_dict, drawing_ids):
-    """ True if elem_dict has drawing not contained in drawing_ids already """
-    return 'd_id' in elem_dict and not any(d for d in drawing_ids if d.d_id == elem_dict['d_id'])
+def concurrent_requests(client, urls, max_workers, timeout=None):
+    """
+    Requests each url with a bounded pool of threads, each sending over a connection checked out of the client's
+    http pool.  A failed or timed out request does not affect the others.
+    :param client: gapiclient.Client used to send requests
+    :param urls: List of urls to request
+    :param max_workers: Maximum number of concurrent requests
+    :param timeout: Optional socket timeout in seconds for each request
+    :return: List of (response, content) in the same order as urls, with None for each failed url
+    """
+
+    def fetch(url):
+        try:
+            return client.request(url, timeout=timeout)
+        except client.HttpError:
+            return None
+        # noinspection PyBroadException
+        except Exception:
+            logger.debug('Request failed for url {}'.format(url), exc_info=True)
+            return None
+
+    if not urls:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(urls)))) as pool:
+        return list(pool.map(fetch, urls))
+
+
+def default_blob_cache():
+    """ Returns the BlobCache shared by image and drawing downloads, in the kumodocs working directory """
+    return BlobCache(os.path.join(KIOutils.kumo_working_directory(), gsuite.BLOB_CACHE_DIR), gsuite.BLOB_CACHE_SIZE)
 
 
 def has_element(line_dict):
@@ -121,16 +149,28 @@ def rm_sugg_text(line_dict, suggestion):
                                   content=new_content, deleted=suggestion.deleted)
 
 
-def find_sugg_by_index(line_dict, suggestions):
-    """ Searches for Suggestion that contains start_index in its [start,end] range """
-    suggestion = [s for s in suggestions.values() if s.start <= line_dict['start_index'] <= s.end]
+def find_sugg_by_index(line_dict, suggestions, sugg_index=None):
+    """
+    Searches for Suggestion that contains start_index in its [start,end] range
+    :param line_dict: Action dictionary of a delete suggestion
+    :param suggestions: Dictionary of sug_id -> Suggestion
+    :param sugg_index: Optional IntervalIndex over the [start, end] range of each suggestion, otherwise every
+    suggestion is scanned
+    :return: First matching Suggestion in the order of suggestions, or None
+    """
+    index = line_dict['start_index']
+    if sugg_index is not None:
+        suggestion = [suggestions[sug_id] for sug_id in sugg_index.find(index)]
+    else:
+        suggestion = [s for s in suggestions.values() if s.start <= index <= s.end]
+
     if len(suggestion) == 1:
         return suggestion[0]
     elif len(suggestion) > 1:
-        logger.debug('Too many suggestions: {}'.format(suggestion))
+        logger.debug('Too many suggestions: %s', suggestion)
         return suggestion[0]
     else:
-        logger.debug('Could not find suggestion: \n line dict = {}\n suggestions= {}'.format(line_dict, suggestions))
+        logger.debug('Could not find suggestion: \n line dict = %s\n suggestions= %s', line_dict, suggestions)
         return None
 
 
@@ -149,16 +189,25 @@ def has_delete_action(action_dict):
     return action_dict['type'].startswith('ds')
 
 
-def insert_text(action_dict, plain_text):
+def insert_text(action_dict, text_buffer):
+    """ Applies an insert action to text_buffer, a PieceTable """
     i = action_dict['ins_index']
     s = action_dict['string']
-    return insert(old_string=plain_text, new_string=s, index=i, index_offset=INDEX_OFFSET)
+    text_buffer.insert(i + INDEX_OFFSET, s)
 
 
-def delete_text(action_dict, plain_text):
+def delete_text(action_dict, text_buffer):
+    """ Applies a delete action to text_buffer, a PieceTable """
     si = action_dict['start_index']
     ei = action_dict['end_index']
-    return delete(old_string=plain_text, starting_index=si, ending_index=ei, index_offset=INDEX_OFFSET)
+    text_buffer.delete(si + INDEX_OFFSET, ei)
+
+
+def text_edit(action_dict):
+    """ Returns an insert or delete action as an edit for gsuite.revisions, [index, string] or [start, end] """
+    if has_insert_action(action_dict):
+        return [action_dict['ins_index'] + INDEX_OFFSET, action_dict['string']]
+    return [action_dict['start_index'] + INDEX_OFFSET, action_dict['end_index']]
 
 
 class DocsHandler(Handler):
@@ -173,6 +222,9 @@ class DocsHandler(Handler):
     def __init__(self, client, delimiter=None, parsers=None):
         super(DocsHandler, self).__init__(client, delimiter)
         self._parsers = [self.init_parser(p) for p in parsers or self.collect_parsers(__name__)]
+        self._doc_objects = None
+        self._resumed = None
+        self.doc_objects = None
 
     Suggestion = namedtuple('Suggestion', 'start, end, sug_id, content deleted')
 
@@ -186,103 +238,95 @@ class DocsHandler(Handler):
     def parse_log(self, c_log):
         """parses changelog part of log"""
 
-        flat_log = ['changelog{}{}'.format(self.delimiter, '{}')]
+        flat_log = [CHANGELOG_HEADER]
         for entry in c_log:
             action_dict = entry[0]
-            ts_id_info = entry[1:-1]
-            line = ts_id_info
+            ts_id_info = tuple(entry[1:-1])
 
             # break up multiset into components
             if 'mts' in action_dict:
-                line_copy = []
-                self.flatten_mts(action_dict, line_copy, line)
-                for item in line_copy:
-                    flat_log.append(self.delimiter.join(str(col) for col in item))
+                flat_log.extend(self.flatten_mts(action_dict, ts_id_info))
             else:
                 action_type = mappings.remap(action_dict['ty'])
-                line.append(action_type)
-                line.append(json.dumps(self.rename_keys(action_dict)))
-                flat_log.append(self.delimiter.join(str(item) for item in line))
+                flat_log.append(self.FlatRecord(ts_id_info, action_type, self.rename_keys(action_dict)))
 
         return flat_log
 
     def parse_snapshot(self, snapshot):
         """parses snapshot part of log"""
 
-        flat_log = ['chunkedSnapshot{}{}'.format(self.delimiter, '{}')]
+        flat_log = [SNAPSHOT_HEADER]
         snapshot = snapshot[0]
 
-        # take care of plain text paste entry
-        if 's' in snapshot[0]:
-            snapshot[0]['type'] = snapshot[0].pop('ty')
-            snapshot[0]['string'] = snapshot[0].pop('s').replace('\n', '\\n')
-            del snapshot[0]['ibi']  # this value is always 1 and unused
-            flat_log.append(json.dumps(snapshot.pop(0)))  # pop entry to remove special case
+        text_entry = self.pop_snapshot_text(snapshot)
+        if text_entry is not None:
+            flat_log.append(self.FlatRecord((), None, text_entry))
 
         # parse style modifications
         for entry in snapshot:
-            line = self.get_snapshot_line(snapshot_entry=entry)
-            flat_log.append(self.delimiter.join(str(item) for item in line))
+            flat_log.append(self.get_snapshot_line(snapshot_entry=entry))
 
         return flat_log
 
-    def flatten_mts(self, entry, line_copy, line):
-        """ Recursively flatten multiset entry.
+    @staticmethod
+    def pop_snapshot_text(snapshot):
+        """
+        Removes the plain text paste entry from the start of snapshot and renames its keys.  The entry is changed
+        in the log itself, which is how the log is then written to revision-log.txt
+        :return: The renamed entry, or None if snapshot does not start with one
+        """
+        if snapshot and 's' in snapshot[0]:
+            snapshot[0]['type'] = snapshot[0].pop('ty')
+            snapshot[0]['string'] = snapshot[0].pop('s').replace('\n', '\\n')
+            del snapshot[0]['ibi']  # this value is always 1 and unused
+            return snapshot.pop(0)  # pop entry to remove special case
+        return None
+
+    def flatten_mts(self, entry, line):
+        """ Lazily flatten multiset entry with an explicit stack, so deep nesting does not recurse.
 
       Args:
         entry: an entry in changelog
-        line_copy: a flattened list of each mts action appended to line
-        line:  shared info for the entry( id, revision, timestamp, etc)
+        line:  shared info for the entry( id, revision, timestamp, etc), referenced by every record, not copied
       Returns:
-        None.  line_copy contains flattened entries to be appended to log.
+        Generator of a FlatRecord for each mts action, in depth-first order
       """
-        if 'mts' not in entry:
-            new_line = list(line)
-            mts_action = mappings.remap(entry['ty'])
-
-            # add action & action dictionary with descriptive keys
-            new_line.append(mts_action)
-            new_line.append(json.dumps(self.rename_keys(entry)))
-            line_copy.append(new_line)
-
-        else:
-            for item in entry['mts']:
-                self.flatten_mts(item, line_copy, line)
+        stack = [iter((entry,))]
+        while stack:
+            for item in stack[-1]:
+                if 'mts' in item:
+                    stack.append(iter(item['mts']))
+                    break
+                # add action & action dictionary with descriptive keys
+                yield self.FlatRecord(line, mappings.remap(item['ty']), self.rename_keys(item))
+            else:
+                stack.pop()
 
-    def rename_keys(self, log_dict):
+    @staticmethod
+    def rename_keys(log_dict):
         """rename minified variables using mappings in `mappings.py`. preserves order"""
-        log_dict = OrderedDict(log_dict)
-        # Create a list of keys to avoid RuntimeError in Python 3
-        for key in list(log_dict.keys()):
-            try:
-                new_key = mappings.remap(key)
-                log_dict[new_key] = log_dict.pop(key)
-
-                # recursively replace deep dictionaries
-                if isinstance(log_dict[new_key], dict):
-                    log_dict[new_key] = self.rename_keys(log_dict[new_key])
-            except KeyError:
-                # if key is not in mappings, leave old key unchanged.
-                pass
-
-        return log_dict
+        return mappings.remap_keys(log_dict)
 
     def get_snapshot_line(self, snapshot_entry):
         """
         Turns raw line from snapshot into a translated version for flat_log with style dictionary at end
         :param snapshot_entry: A line in the snapshot part of the log
-        :return: line entry for flat_log with style dictionary at end
+        :return: FlatRecord for flat_log with style dictionary as action
         """
-        line = []
-        for key in gsuite.CHUNKED_ORDER:
-            line.append(snapshot_entry[key])
-
+        info = tuple(snapshot_entry[key] for key in gsuite.CHUNKED_ORDER)
         action_type = mappings.remap(snapshot_entry['ty'])
-        style_mod = json.dumps(self.rename_keys(snapshot_entry['sm']))
-        line.append(action_type)
-        line.append(style_mod)
+        style_mod = self.rename_keys(snapshot_entry['sm'])
+
+        return self.FlatRecord(info, action_type, style_mod)
 
-        return line
+    def visitor(self, log, choice):
+        """ Collects image_ids, drawing_ids, and suggestions for parser_opts during the walk over flat_log """
+        if self._resumed is not None:
+            # already advanced over the new lines by resume_flat_log
+            self._doc_objects, self._resumed = self._resumed, None
+            return None
+        self._doc_objects = DocObjects()
+        return self._doc_objects
 
     def get_doc_objects(self, flat_log):
         """
@@ -290,38 +334,133 @@ class DocsHandler(Handler):
         :param flat_log: preprocessed version of google changelog
         :return: list of comment_anchors, image_ids, drawing_ids, and a suggestions dictionary
         """
+        doc_objects = self._doc_objects
+        self._doc_objects = None
+        if doc_objects is None:
+            doc_objects = DocObjects()
+            for line in flat_log:
+                doc_objects(line)
+        self.doc_objects = doc_objects
+
         logger.info('Recovering image_ids, drawing_ids, and suggestions')
-        image_ids = set()
-        drawing_ids = []
-        suggestions = {}
+        sugg_obj = self.KumoObj(filename='suggestions.txt',
+                                content=json.dumps(doc_objects.suggestions, ensure_ascii=False))
+        return doc_objects.image_ids, doc_objects.drawing_ids, sugg_obj
 
-        for line in flat_log:
-            try:
-                i = line.index('{')
-                line_dict = json.loads(line[i:])
-            except ValueError:
-                pass  # either chunked or changelog header without dict, no action needed
-            else:
-                if has_element(line_dict):
-                    elem_dict = line_dict['epm']['ee_eo']
-                    if has_img(elem_dict):
-                        image_ids.add(elem_dict['img_cosmoId'])
-                    elif has_drawing(elem_dict, drawing_ids):
-                        drawing_ids.append(new_drawing(elem_dict))
-                elif 'type' in line_dict:
-                    if is_insert_suggestion(line_dict):
-                        sug_id = line_dict['sug_id']
-                        if sug_id in suggestions:
-                            suggestions[sug_id] = ins_sugg_text(line_dict, suggestions[sug_id])
-                        else:
-                            suggestions[sug_id] = new_suggestion(line_dict)
-                    elif is_delete_suggestion(line_dict):
-                        suggestion = find_sugg_by_index(line_dict, suggestions)
-                        if suggestion:
-                            suggestions[suggestion.sug_id] = rm_sugg_text(line_dict, suggestion)
-
-        sugg_obj = self.KumoObj(filename='suggestions.txt', content=json.dumps(suggestions, ensure_ascii=False))
-        return image_ids, drawing_ids, sugg_obj
+    def flat_log_state(self, flat_log):
+        """
+        Returns flat_log and the objects found in it by get_doc_objects in a json serializable form, to be passed to
+        resume_flat_log once later revisions are available
+        :return: Dictionary of flat_log and doc_objects, or None if get_doc_objects has not run
+        """
+        if self.doc_objects is None:
+            return None
+        return {'flat_log': flat_log, 'doc_objects': self.doc_objects.state()}
+
+    def resume_flat_log(self, log, state, cached_end):
+        """
+        Restores a flat log saved by flat_log_state, then flattens and appends only the changelog entries after
+        cached_end.  The saved image_ids, drawing_ids, and suggestions are advanced over the appended lines and used
+        by get_doc_objects in place of a new walk over flat_log.
+        :param log: Revision log with the same start revision as the saved flat log
+        :param state: Dictionary returned by flat_log_state, after a round trip through json
+        :param cached_end: Last revision in the saved flat log
+        :return: flat_log for the whole log
+        """
+        flat_log = [self.FlatRecord(tuple(info), action_type, action)
+                    for info, action_type, action in state['flat_log']]
+        # leave the log as flatten_log would, so that it is written the same way
+        self.pop_snapshot_text(log['chunkedSnapshot'][0])
+        # a changelog entry holds the action followed by the info of its FlatRecord
+        new_entries = (entry for entry in log['changelog'] if entry[REV_INDEX + 1] > cached_end)
+        new_lines = self.parse_log(new_entries)[1:]  # CHANGELOG_HEADER is already in flat_log
+
+        doc_objects = DocObjects.from_state(state['doc_objects'])
+        for line in new_lines:
+            doc_objects(line)
+        self._resumed = doc_objects
+
+        flat_log.extend(new_lines)
+        return flat_log
+
+
+class DocObjects(object):
+    """ Flat log visitor that discovers image_ids, drawing_ids, and suggestions """
+
+    def __init__(self):
+        self.images = OrderedDict()  # cosmo image ids, as an ordered set
+        self.drawings = OrderedDict()
+        self.suggestions = {}
+        self.sugg_index = IntervalIndex()
+
+    @classmethod
+    def from_state(cls, state):
+        """ Restores DocObjects from the dictionary returned by state(), after a round trip through json """
+        doc_objects = cls()
+        doc_objects.images.update((img_id, None) for img_id in state['image_ids'])
+        for drawing in state['drawings']:
+            doc_objects.drawings[drawing[0]] = gsuite.Drawing(*drawing)
+        for suggestion in state['suggestions']:
+            doc_objects.set_suggestion(DocsHandler.Suggestion(*suggestion))
+        return doc_objects
+
+    def state(self):
+        """ Returns the discovered objects as a json serializable dictionary """
+        return {'image_ids': self.image_ids, 'drawings': list(self.drawings.values()),
+                'suggestions': list(self.suggestions.values())}
+
+    @property
+    def image_ids(self):
+        """ List of cosmo image ids in the order they were first seen """
+        return list(self.images)
+
+    @property
+    def drawing_ids(self):
+        """ List of Drawings in the order they were first seen """
+        return list(self.drawings.values())
+
+    def add_drawing(self, elem_dict):
+        """
+        Records the drawing in elem_dict, keeping the size of the largest occurrence of each d_id by area, so that
+        the drawing is downloaded in a shape it was actually used at
+        """
+        d_id = elem_dict['d_id']
+        seen = self.drawings.get(d_id)
+        if seen is None:
+            self.drawings[d_id] = new_drawing(elem_dict)
+        elif 'img_wth' in elem_dict and 'img_ht' in elem_dict:
+            drawing = new_drawing(elem_dict)
+            if drawing.width * drawing.height > seen.width * seen.height:
+                self.drawings[d_id] = drawing
+
+    def set_suggestion(self, suggestion):
+        """ Stores suggestion and keeps its range in sugg_index current """
+        self.suggestions[suggestion.sug_id] = suggestion
+        self.sugg_index.set(suggestion.sug_id, suggestion.start, suggestion.end)
+
+    def __call__(self, line):
+        line_dict = line.action
+        if not line_dict:
+            return  # chunked or changelog header has an empty dict, no action needed
+
+        if has_element(line_dict):
+            elem_dict = line_dict['epm']['ee_eo']
+            if has_img(elem_dict):
+                self.images[elem_dict['img_cosmoId']] = None
+            elif 'd_id' in elem_dict:
+                self.add_drawing(elem_dict)
+        elif 'type' in line_dict:
+            suggestions = self.suggestions
+            if is_insert_suggestion(line_dict):
+                sug_id = line_dict['sug_id']
+                if sug_id in suggestions:
+                    self.set_suggestion(ins_sugg_text(line_dict, suggestions[sug_id]))
+                else:
+                    self.set_suggestion(new_suggestion(line_dict))
+            elif is_delete_suggestion(line_dict):
+                suggestion = find_sugg_by_index(line_dict, suggestions, self.sugg_index)
+                if suggestion:
+                    self.set_suggestion(rm_sugg_text(line_dict, suggestion))
 
 
 class CommentsParser(Parser):
@@ -391,6 +530,11 @@ class ImageParser(Parser):
 
     Image = namedtuple('Image', 'content extension img_id')
 
+    def __init__(self, client, delimiter='|', max_workers=gsuite.HTTP_POOL_SIZE, blob_cache=None):
+        super(ImageParser, self).__init__(client, delimiter)
+        self.max_workers = max_workers
+        self.blob_cache = blob_cache or default_blob_cache()
+
     def parse(self, log, flat_log, choice, **kwargs):
         image_ids = kwargs.get('image_ids')
         self.logger.info('Retrieving images')
@@ -401,26 +545,36 @@ class ImageParser(Parser):
 
     def get_images(self, image_ids, file_id, drive):
         """
-        Retrieves images using private API and image_ids
+        Retrieves images using private API and image_ids.  Images already in self.blob_cache are read from it,
+        skipping both the renderdata request and the download, and an image being downloaded for another document
+        at the same time, in any process, is waited for instead of downloaded again.
         :param image_ids: Cosmo image IDs retrieved from a Google Docs log
         :param file_id: Unique GSuite file ID
         :param drive: Type of GSuite service
         :return: List of KumoObj with image contents.
         """
-        images = []
-        links = self.get_image_links(image_ids=image_ids, file_id=file_id, drive=drive)
-        if links:
-            for url, img_id in links.values():
-                try:
-                    response, content = self.client.request(url)
-                except self.client.HttpError:
-                    self.logger.debug('Image could not be retrieved:\n\turl={}\n\t img_id={}'.format(url, img_id))
-                else:
-                    extension = get_download_ext(response)
-                    img = self.Image(content, extension, img_id)
-                    images.append(img)
 
-        return images
+        def download(keys):
+            downloaded = {}
+            links = self.get_image_links(image_ids=[key[1] for key in keys], file_id=file_id, drive=drive)
+            if links:
+                links = list(links.values())
+                results = concurrent_requests(self.client, [url for url, _ in links], self.max_workers)
+                for (url, img_id), result in zip(links, results):
+                    if result is None:
+                        self.logger.debug(
+                            'Image could not be retrieved:\n\turl={}\n\t img_id={}'.format(url, img_id))
+                    else:
+                        response, content = result
+                        extension = get_download_ext(response)
+                        downloaded[('image', img_id)] = content, extension
+                        if extension != '.failed':
+                            self.blob_cache.put(('image', img_id), content, extension)
+            return downloaded
+
+        keys = [('image', img_id) for img_id in OrderedDict.fromkeys(image_ids)]
+        found = self.blob_cache.fetch_all(keys, download)
+        return [self.Image(found[key][0], found[key][1], key[1]) for key in keys if key in found]
 
     def get_image_links(self, image_ids, file_id, drive):
         """ Sends url request to google API which returns a link for each image resource, returns
@@ -439,8 +593,8 @@ class ImageParser(Parser):
             if isinstance(content, bytes):
                 content = content.decode('utf-8')
             content = json.loads(content[5:])
-            # keep association of image ids with image
-            for i, img_id in enumerate(image_ids):
+            # keep association of image ids with image, numbered as in get_render_request
+            for i, img_id in enumerate(OrderedDict.fromkeys(image_ids)):
                 key = 'r' + str(i)
                 content[key] = (content.pop(key), img_id)
             return content
@@ -448,9 +602,8 @@ class ImageParser(Parser):
     def get_render_request(self, image_ids, file_id, drive):
         """ Returns url request to retrieve images with image_ids contained in file with file_id"""
 
-        image_ids = set(image_ids)
         data = {}
-        for i, img_id in enumerate(image_ids):
+        for i, img_id in enumerate(OrderedDict.fromkeys(image_ids)):
             key = "r" + str(i)
             # unicode image_ids are not accepted in the request, so they must be encoded as strings
             data[key] = ["image", {"cosmoId": img_id.encode(), "container": file_id}]
@@ -492,6 +645,13 @@ class DrawingsParser(Parser):
 
     Drawing = namedtuple('Drawing', 'content extension')
 
+    def __init__(self, client, delimiter='|', max_workers=gsuite.HTTP_POOL_SIZE, timeout=gsuite.DRAWING_TIMEOUT,
+                 blob_cache=None):
+        super(DrawingsParser, self).__init__(client, delimiter)
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.blob_cache = blob_cache or default_blob_cache()
+
     def parse(self, log, flat_log, choice, **kwargs):
         self.logger.info('Retrieving drawings')
         drawing_ids = kwargs.get('drawing_ids')
@@ -501,7 +661,9 @@ class DrawingsParser(Parser):
 
     def get_drawings(self, drawing_ids, drive):
         """
-        Returns a list Drawings corresponding to drawing_ids recovered from log
+        Returns a list Drawings corresponding to drawing_ids recovered from log, reading drawings of the same id and
+        size from self.blob_cache instead of downloading them again, or waiting for them if they are being
+        downloaded for another document at the same time, in any process
         :param drawing_ids: A list of drawing_ids retrieved from log 
         :param drive: Location of drawing resource denoted by drive, usually Drawings
         :return: A list of Drawings with content and extension 
@@ -509,21 +671,31 @@ class DrawingsParser(Parser):
 
         # TODO get_download_ext -> call from client
         # TODO fix source of drive instead of hard coding
-        drawings, drive = [], 'drawings'
-        for drawing in drawing_ids:
-            # url = DRAW_PATH.format(d_id=drawing_id[0], w=drawing_id[1], h=drawing_id[2])
-            params = gsuite.DRAW_PARAMS.format(w=drawing.width, h=drawing.height)
-            url = gsuite.API_BASE.format(params=params, drive=drive, file_id=drawing.d_id)
-
-            try:
-                response, content = self.client.request(url)
-            except self.client.HttpError:
-                self.logger.info('Could not retrieve Drawing id {}'.format(drawing.d_id))
-            else:
-                extension = get_download_ext(response)
-                drawings.append(self.Drawing(content, extension))
+        drive = 'drawings'
+
+        def download(keys):
+            downloaded, urls = {}, []
+            for key in keys:
+                drawing = gsuite.Drawing(*key[1:])
+                # url = DRAW_PATH.format(d_id=drawing_id[0], w=drawing_id[1], h=drawing_id[2])
+                params = gsuite.DRAW_PARAMS.format(w=drawing.width, h=drawing.height)
+                urls.append(gsuite.API_BASE.format(params=params, drive=drive, file_id=drawing.d_id))
+
+            results = concurrent_requests(self.client, urls, self.max_workers, timeout=self.timeout)
+            for key, result in zip(keys, results):
+                if result is None:
+                    self.logger.info('Could not retrieve Drawing id {}'.format(key[1]))
+                else:
+                    response, content = result
+                    extension = get_download_ext(response)
+                    downloaded[key] = content, extension
+                    if extension != '.failed':
+                        self.blob_cache.put(key, content, extension)
+            return downloaded
 
-        return drawings
+        keys = [('drawing',) + tuple(drawing) for drawing in drawing_ids]
+        found = self.blob_cache.fetch_all(keys, download)
+        return [self.Drawing(*found[key]) for key in keys if key in found]
 
 
 class PlaintextParser(Parser):
@@ -533,38 +705,252 @@ class PlaintextParser(Parser):
     def logger(self):
         return logger
 
+    def __init__(self, client, delimiter='|'):
+        super(PlaintextParser, self).__init__(client, delimiter)
+        self._replay = None
+
+    def visitor(self, log, choice):
+        self._replay = TextReplay()
+        return self._replay
+
     def parse(self, log, flat_log, choice, **kwargs):
         self.logger.info('Recovering plain text')
-        plain_text = self.get_plain_text(flat_log=flat_log)
+        replay, self._replay = self._replay, None
+        plain_text = replay.text if replay else self.get_plain_text(flat_log=flat_log)
         pt_obj = self.KumoObj(filename='plaintext.txt', content=plain_text.encode('utf-8'))
         return [pt_obj]
 
-    def get_plain_text(self, flat_log):
+    @staticmethod
+    def get_plain_text(flat_log):
         """ converts flat log to plaintext"""
-        plain_text = ''
-        snapshot_line = 'chunkedSnapshot{}{}'.format(self.delimiter, '{}')
-        changelog_line = 'changelog{}{}'.format(self.delimiter, '{}')
-        log_dict = get_dict(flat_log[flat_log.index(snapshot_line) + 1])
-
-        # should not contain a string if log starts at revision 1
-        if 'string' in log_dict:
-            chunk_string = log_dict['string']
-            # chunk_string = chunk_string.decode('unicode-escape')
-            plain_text += chunk_string
-
-        # start after changelog line, which has no data
-        cl_index = flat_log.index(changelog_line) + 1
-
-        for line in flat_log[cl_index:]:
-            try:
-                action_dict = get_dict(line)
-            except ValueError:
-                pass
+        replay = TextReplay()
+        for line in flat_log:
+            replay(line)
+        return replay.text
+
+    @staticmethod
+    def replay_revisions(flat_log, interval=gsuite.CHECKPOINT_REVS, checkpoint_dir=None):
+        """
+        Replays flat_log once, keeping checkpoints so that the text at any revision can be rebuilt cheaply
+        :param flat_log: preprocessed version of google changelog
+        :param interval: Revisions between checkpoints
+        :param checkpoint_dir: Directory to write checkpoints to, or None to keep them compressed in memory
+        :return: RevisionReplay answering text_at(rev)
+        """
+        replay = RevisionReplay(interval, checkpoint_dir)
+        for line in flat_log:
+            replay(line)
+        return replay
+
+
+class TextReplay(object):
+    """ Flat log visitor that replays the snapshot string and every insert and delete into a PieceTable """
+
+    def __init__(self):
+        self.plain_text = PieceTable()
+        self._after_snapshot = False
+        self._in_changelog = False
+
+    @property
+    def text(self):
+        return self.plain_text.getvalue()
+
+    def __call__(self, line):
+        if self._in_changelog:
+            action_dict = line.action
+            if has_insert_action(action_dict):
+                insert_text(action_dict, self.plain_text)
+
+            elif has_delete_action(action_dict):
+                delete_text(action_dict, self.plain_text)
+
+        elif line == CHANGELOG_HEADER:
+            # start after changelog line, which has no data
+            self._in_changelog = True
+
+        elif self._after_snapshot:
+            self._after_snapshot = False
+            # should not contain a string if log starts at revision 1
+            if 'string' in line.action:
+                self.plain_text.insert(0, line.action['string'])
+
+        elif line == SNAPSHOT_HEADER:
+            self._after_snapshot = True
+
+
+class RevisionReplay(TextReplay):
+    """
+    TextReplay that also stores a compressed checkpoint of the text at least every interval revisions, along with
+    each insert and delete in the changelog, so that text_at(rev) replays only from the nearest checkpoint
+    """
+
+    def __init__(self, interval=gsuite.CHECKPOINT_REVS, checkpoint_dir=None):
+        super(RevisionReplay, self).__init__()
+        self.interval = interval
+        self.checkpoints = DiskCheckpoints(checkpoint_dir) if checkpoint_dir else MemoryCheckpoints()
+        self._revs = []  # revision of each checkpoint, ascending
+        self._positions = []  # index into _actions where replay from each checkpoint starts
+        self._actions = []  # (rev, action_dict) of each text action in the changelog
+        self._rev = None
+
+    def __call__(self, line):
+        if not self._in_changelog:
+            super(RevisionReplay, self).__call__(line)
+            if self._in_changelog:
+                # the snapshot holds the text before the first revision in the log
+                self._checkpoint(0)
+            return
+
+        action_dict = line.action
+        if has_insert_action(action_dict) or has_delete_action(action_dict):
+            rev = line.info[REV_INDEX]
+            if rev != self._rev:
+                if self._rev is not None and self._rev - self._revs[-1] >= self.interval:
+                    self._checkpoint(self._rev)
+                self._rev = rev
+            self._actions.append((rev, action_dict))
+        super(RevisionReplay, self).__call__(line)
+
+    def _checkpoint(self, rev):
+        self.checkpoints.put(rev, self.text)
+        self._revs.append(rev)
+        self._positions.append(len(self._actions))
+
+    def text_at(self, rev):
+        """
+        Rebuilds the text after every action up to and including revision rev.  Revisions before the start of the
+        log give the snapshot text, and revisions past its end give the final text.
+        :param rev: Revision number
+        :return: Document text at rev
+        """
+        i = bisect.bisect_right(self._revs, rev) - 1
+        if i < 0:
+            raise ValueError('No checkpoint precedes revision {}'.format(rev))
+
+        text_buffer = PieceTable(self.checkpoints.get(self._revs[i]))
+        for j in range(self._positions[i], len(self._actions)):
+            action_rev, action_dict = self._actions[j]
+            if action_rev > rev:
+                break
+            if has_insert_action(action_dict):
+                insert_text(action_dict, text_buffer)
             else:
-                if has_insert_action(action_dict):
-                    plain_text = insert_text(action_dict, plain_text)
+                delete_text(action_dict, text_buffer)
+        return text_buffer.getvalue()
+
+
+class RevisionsParser(Parser):
+    """ Methods to export the text of every revision as a base text plus the text edits of each revision """
+
+    option = 'revisions'
+
+    @property
+    def logger(self):
+        return logger
+
+    def __init__(self, client, delimiter='|'):
+        super(RevisionsParser, self).__init__(client, delimiter)
+        self._diffs = None
+
+    def visitor(self, log, choice):
+        self._diffs = RevisionDiffs()
+        return self._diffs
+
+    def parse(self, log, flat_log, choice, **kwargs):
+        self.logger.info('Recovering revision history')
+        diffs, self._diffs = self._diffs, None
+        if diffs is None:
+            diffs = RevisionDiffs()
+            for line in flat_log:
+                diffs(line)
+
+        # written as text with newline='', as RevisionHistory.load reads it, so that \r in the text is kept
+        base_obj = self.KumoObj(filename=BASE_FILENAME, content=lambda f: f.write(diffs.text))
+        diff_obj = self.KumoObj(filename=DIFF_FILENAME, content='\n'.join(diffs.finish()).encode('utf-8'))
+        return [base_obj, diff_obj]
+
+
+class RevisionDiffs(TextReplay):
+    """ Flat log visitor that keeps the snapshot text and collects the text edits of each revision as diff lines """
+
+    def __init__(self):
+        super(RevisionDiffs, self).__init__()
+        self.lines = []
+        self._rev = None
+        self._edits = []
+
+    def __call__(self, line):
+        if not self._in_changelog:
+            super(RevisionDiffs, self).__call__(line)
+            return
+
+        action_dict = line.action
+        if has_insert_action(action_dict) or has_delete_action(action_dict):
+            rev = line.info[REV_INDEX]
+            if rev != self._rev:
+                self._end_revision()
+                self._rev = rev
+            self._edits.append(text_edit(action_dict))
+
+    def _end_revision(self):
+        if self._edits:
+            self.lines.append(dump_revision(self._rev, self._edits))
+            self._edits = []
+
+    def finish(self):
+        """ Returns the diff line of every revision, including the last """
+        self._end_revision()
+        return self.lines
+
+
+class AttributionParser(Parser):
+    """ Methods to recover the author and revision that inserted each range of the plain text """
+
+    option = 'attribution'
 
-                elif has_delete_action(action_dict):
-                    plain_text = delete_text(action_dict, plain_text)
+    @property
+    def logger(self):
+        return logger
+
+    def __init__(self, client, delimiter='|'):
+        super(AttributionParser, self).__init__(client, delimiter)
+        self._replay = None
+
+    def visitor(self, log, choice):
+        self._replay = AttributionReplay()
+        return self._replay
+
+    def parse(self, log, flat_log, choice, **kwargs):
+        self.logger.info('Recovering text attribution')
+        replay, self._replay = self._replay, None
+        if replay is None:
+            replay = AttributionReplay()
+            for line in flat_log:
+                replay(line)
+
+        content = '\n'.join(self.delimiter.join(str(col) for col in span) for span in replay.spans())
+        return [self.KumoObj(filename='attribution.txt', content=content.encode('utf-8'))]
 
-        return plain_text
+
+class AttributionReplay(TextReplay):
+    """
+    TextReplay that tags each insert with its (uid, rev), so the tags follow the text through later edits.  Text
+    from the snapshot has no known author and is tagged None.
+    """
+
+    def __call__(self, line):
+        if self._in_changelog and has_insert_action(line.action):
+            action_dict, info = line.action, line.info
+            self.plain_text.insert(action_dict['ins_index'] + INDEX_OFFSET, action_dict['string'],
+                                   (info[UID_INDEX], info[REV_INDEX]))
+        else:
+            super(AttributionReplay, self).__call__(line)
+
+    def spans(self):
+        """
+        Run-length encoded attribution of the current text
+        :return: Generator of (start, end, uid, rev), where [start, end) indexes the plain text
+        """
+        for start, end, tag in self.plain_text.spans():
+            uid, rev = tag or (None, None)
+            yield start, end, uid, rev
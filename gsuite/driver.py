@@ -1,11 +1,15 @@
 import json
 import logging
 import os
+import time
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 import KIOutils
 import gsuite
 from gsuite import gapiclient
+from gsuite.logcache import LogCache
+from gsuite.logstream import StreamedLog
 from baseclass import Driver
 from gsuite.docshandler import DocsHandler
 from gsuite.formshandler import FormsHandler
@@ -13,6 +17,23 @@ from gsuite.sheetshandler import SheetsHandler
 from gsuite.slideshandler import SlidesHandler
 
 
+def adapt_chunk_size(chunk_size, revisions, size, elapsed):
+    """
+    Estimates how many revisions fit in a chunk that downloads within gsuite.LOG_CHUNK_SECONDS and stays under
+    gsuite.LOG_CHUNK_BYTES, given one observed chunk, and moves the current chunk size halfway toward it.
+    :param chunk_size: Current chunk size in revisions
+    :param revisions: Number of revisions in the observed chunk
+    :param size: Response size of the observed chunk in bytes
+    :param elapsed: Download time of the observed chunk in seconds
+    :return: New chunk size in revisions
+    """
+    by_time = gsuite.LOG_CHUNK_SECONDS * revisions / max(elapsed, 0.001)
+    by_size = gsuite.LOG_CHUNK_BYTES * revisions / max(size, 1)
+    target = min(by_time, by_size)
+    low, high = gsuite.LOG_CHUNK_BOUNDS
+    return int(min(high, max(low, (chunk_size + target) / 2)))
+
+
 class GSuiteDriver(Driver):
     """ 
     Functionality to retrieve and flattens Google Docs logs, and recover plain-text, suggestions, comments, 
@@ -25,7 +46,8 @@ class GSuiteDriver(Driver):
 
     SuggestionContent = namedtuple('content', 'added, deleted')
 
-    def __init__(self, base_dir='downloaded', delimiter='|', parser=None):
+    def __init__(self, base_dir='downloaded', delimiter='|', parser=None, log_cache=None, stream_log=False,
+                 unique_dirs=False, incremental=False, flat_cache=None, options=()):
         self.client = gapiclient.Client(service='drive', scope=['https://www.googleapis.com/auth/drive',
                                                                 'https://www.googleapis.com/auth/forms'])
         self._logger = logging.getLogger(__name__)
@@ -35,6 +57,14 @@ class GSuiteDriver(Driver):
         self._parser = parser
         self.choice_start = None
         self.choice_end = None
+        self.stream_log = stream_log
+        self.unique_dirs = unique_dirs
+        self.log_cache = log_cache or LogCache(os.path.join(KIOutils.kumo_working_directory(), gsuite.LOG_CACHE_DIR),
+                                               max_bytes=gsuite.LOG_CACHE_SIZE)
+        self.incremental = incremental
+        self.options = frozenset(options)  # optional parsers to enable, see baseclass.Parser.option
+        self.flat_cache = flat_cache or LogCache(os.path.join(KIOutils.kumo_working_directory(),
+                                                              gsuite.FLAT_CACHE_DIR), max_bytes=gsuite.LOG_CACHE_SIZE)
 
     def init_parser(self, choice=None):
         """ Initializes the correct parser for the given choice"""
@@ -46,6 +76,7 @@ class GSuiteDriver(Driver):
             raise NotImplementedError('{} service not implemented'.format(choice.drive))
         else:
             parser = service_parser(self.client)
+            parser.enable_parsers(self.options)
 
         return parser
 
@@ -83,6 +114,31 @@ class GSuiteDriver(Driver):
 
         return self.choice
 
+    def select_file(self, file_id, start=None, end=None):
+        """
+        Non-interactive counterpart of choose_file and prompt_rev_range.  Looks up file_id and checks the revision
+        range against the same bounds as prompt_rev_range.
+        :param file_id: Unique GSuite file ID
+        :param start: Starting revision, defaults to 1.  Always 1 for services other than document
+        :param end: Ending revision, defaults to the latest revision
+        :return: Tuple (choice, start, end)
+        """
+        choice = self.client.get_file_choice(file_id)
+        if choice.drive not in GSuiteDriver.SERVICES:
+            raise NotImplementedError('{} service not implemented'.format(choice.drive))
+
+        if choice.drive != 'document' and start not in (None, 1):
+            self.logger.info('Partial revisions for {} are not supported. Setting start = 1'.format(choice.drive))
+            start = 1
+        start = start or 1
+        end = end or choice.max_revs
+        if not 1 <= start <= end <= choice.max_revs:
+            raise ValueError('Invalid revision range {}-{} (max {})'.format(start, end, choice.max_revs))
+
+        self.choice = choice
+        self.choice_start, self.choice_end = start, end
+        return choice, start, end
+
     def prompt_rev_range(self):
         """
         Prompts user for revision range.  Bounds checking added for each particular service as needed
@@ -147,20 +203,97 @@ class GSuiteDriver(Driver):
 
     def get_log(self, start, end, **kwargs):
         """
-        Gets log from the google api client using self.choice data along with starting and ending revision 
+        Gets log from the google api client using self.choice data along with starting and ending revision.  Logs
+        already retrieved for the same file and revision range are read from self.log_cache instead, and for
+        documents a cached log of an earlier end revision is extended by downloading only the newer revisions.
         :param start: Starting revision
         :param end: Ending revision
         :param kwargs: Optional choice parameter for retrieving other logs
-        :return: Native revision log
+        :return: Native revision log, or a StreamedLog for documents when self.stream_log is set
         """
 
         self.logger.info('Retrieving revision log')
         choice = kwargs.get('choice', self.choice)
         self.parser = self.init_parser()
+        streamed = self.stream_log and choice.drive == 'document'
+        cache_key = dict(file_id=choice.file_id, drive=choice.drive, start=start, end=end)
+        cached_log = self.log_cache.get(**cache_key)
+        if cached_log is not None:
+            return StreamedLog([(cached_log, 0)]) if streamed else json.loads(cached_log)
+
+        if choice.drive == 'document':
+            segments, fetch_start = [], start
+            cached_end, cached_log = self.log_cache.latest(choice.file_id, choice.drive, start, end)
+            if cached_log is not None:
+                self.logger.info('Extending cached log from revision {} to {}'.format(cached_end, end))
+                segments.append((cached_log, 0))
+                fetch_start = cached_end + 1
+            segments.extend(self.download_chunks(start=fetch_start, end=end, choice=choice))
+            log = StreamedLog(segments)
+            self.log_cache.put(log, **cache_key)
+            return log if streamed else log.load()
+
+        trimmed_log = self.download_log(start=start, end=end, choice=choice)
+        self.log_cache.put(trimmed_log, **cache_key)
+        return json.loads(trimmed_log)
+
+    def download_chunks(self, start, end, choice):
+        """
+        Downloads the revision range in chunks of revisions over concurrent connections.  A single probe chunk of
+        gsuite.LOG_CHUNK_REVS is downloaded first, and the chunks after it are sized from the size and latency of
+        each response received so far.
+        :return: List of log segments (text, offset) in revision order, as accepted by StreamedLog
+        """
+        chunk_size = gsuite.LOG_CHUNK_REVS
+        if end - start < chunk_size:
+            return [self.download_segment(start=start, end=end, choice=choice)]
+
+        headers = self.log_headers()
+
+        def fetch(chunk_start, chunk_end):
+            began = time.time()
+            segment = self.download_segment(start=chunk_start, end=chunk_end, choice=choice, headers=headers)
+            return chunk_start, chunk_end, time.time() - began, segment
+
+        chunks, pending, next_start = {}, set(), start
+        with ThreadPoolExecutor(max_workers=gsuite.HTTP_POOL_SIZE) as pool:
+            while next_start <= end or pending:
+                # until the probe chunk returns, there is nothing to size the other chunks from
+                while next_start <= end and len(pending) < (gsuite.HTTP_POOL_SIZE if chunks else 1):
+                    chunk_end = min(end, next_start + chunk_size - 1)
+                    pending.add(pool.submit(fetch, next_start, chunk_end))
+                    next_start = chunk_end + 1
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_start, chunk_end, elapsed, segment = future.result()
+                    size = len(segment[0])
+                    self.logger.debug('Downloaded revisions {}-{} ({} bytes in {:.1f}s)'.format(
+                        chunk_start, chunk_end, size, elapsed))
+                    chunks[chunk_start] = segment
+                    chunk_size = adapt_chunk_size(chunk_size, chunk_end - chunk_start + 1, size, elapsed)
+
+        return [chunks[chunk_start] for chunk_start in sorted(chunks)]
+
+    def download_log(self, start, end, choice):
+        """
+        Downloads the revision log for choice and strips gsuite.LOG_START_CHR
+        :return: Trimmed log text
+        """
+        log, offset = self.download_segment(start=start, end=end, choice=choice)
+        return log[offset:]
+
+    def download_segment(self, start, end, choice, headers=None):
+        """
+        Downloads the revision log for choice and checks that it starts with gsuite.LOG_START_CHR
+        :param headers: Optional log headers, retrieved from the parser if not given
+        :return: Tuple (log text, offset of the log json after gsuite.LOG_START_CHR)
+        """
         log_url = self.client.create_log_url(start=start, end=end, choice=choice)
+        headers = headers if headers is not None else self.log_headers()
 
         try:
-            response, log = self.client.request(url=log_url, headers=self.log_headers())
+            response, log = self.client.request(url=log_url, headers=headers)
         except self.client.HttpError:
             self.logger.error('Could not obtain log. Check file_id, max revisions, and permission for file')
             raise SystemExit('Cannot continue without log')
@@ -169,19 +302,32 @@ class GSuiteDriver(Driver):
             if isinstance(log, bytes):
                 log = log.decode('utf-8')
 
-            if log.startswith(gsuite.LOG_START_CHR):
-                trimmed_log = log[len(gsuite.LOG_START_CHR):]
-            else:
+            if not log.startswith(gsuite.LOG_START_CHR):
                 self.logger.debug('Beginning of log = {}'.format(log[:10]))
                 raise gsuite.InvalidLogFormat('Check gsuite.LOG_START_CHR and compare to beginning of log')
 
-        return json.loads(trimmed_log)
+        return log, len(gsuite.LOG_START_CHR)
 
     def flatten_log(self, log):
-        """ Initializes proper parser which converts revision log into flat_log """
+        """
+        Initializes proper parser which converts revision log into flat_log.  With self.incremental set, a flat log
+        saved for the same file and start revision is resumed, so that only revisions after it are flattened.
+        """
+        if self.incremental and hasattr(self.parser, 'resume_flat_log'):
+            key = self.flat_cache_key()
+            cached_end, state = key['end'], self.flat_cache.get(**key)
+            if state is None:
+                cached_end, state = self.flat_cache.latest(**key)
+            if state is not None:
+                self.logger.info('Resuming flat log saved at revision {}'.format(cached_end))
+                return self.parser.resume_flat_log(log, json.loads(state), cached_end)
 
         return self.parser.flatten_log(log)
 
+    def flat_cache_key(self):
+        return dict(file_id=self.choice.file_id, drive=self.choice.drive, start=self.choice_start,
+                    end=self.choice_end)
+
     def recover_objects(self, log, flat_log, choice):
         """
         Runs available parsers to recover any objects
@@ -191,11 +337,25 @@ class GSuiteDriver(Driver):
         :return:
         """
 
-        return self.parser.recover_objects(log=log, flat_log=flat_log, choice=choice)
+        objects = self.parser.recover_objects(log=log, flat_log=flat_log, choice=choice)
+        if self.incremental and hasattr(self.parser, 'flat_log_state'):
+            state = self.parser.flat_log_state(flat_log)
+            if state is not None:
+                self.flat_cache.put(json.dumps(state), **self.flat_cache_key())
+        return objects
 
     def make_base_path(self):
+        """
+        Returns the output directory for the current choice.  With unique_dirs set, the file id is added to the
+        title and the drive/title/range layout is also used under an absolute base_dir, so that files with the same
+        title processed in one batch never share a directory.
+        """
         revision_range = '{start}-{end}'.format(start=self.choice_start, end=self.choice_end)
-        if os.path.isabs(self.base_dir):
+        if self.unique_dirs:
+            title = '{}_{}'.format(self.choice.title, self.choice.file_id)
+            base_path = os.path.realpath(os.path.join(KIOutils.kumo_working_directory(), self.base_dir,
+                                                      self.choice.drive, title, revision_range))
+        elif os.path.isabs(self.base_dir):
             base_path = os.path.realpath(self.base_dir)
         else:
             base_path = os.path.realpath(os.path.join(KIOutils.kumo_working_directory(), self.base_dir,
@@ -1,9 +1,15 @@
 """Common methods for initializing GSuite API client and listing GSuite files. """
+import email.utils
 import json
 import logging
 import os
+import random
+import socket
 import sys
-from collections import defaultdict
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
 
 # noinspection PyPackageRequirements
 import googleapiclient.discovery
@@ -22,12 +28,210 @@ logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 
+class HttpPool(object):
+    """
+    Bounded pool of authorized http connections.  httplib2 is not thread-safe, so each connection is checked out by
+    one thread at a time and returned afterwards, keeping its open sockets alive for the next request from any
+    thread.  At most size connections are checked out at once; further threads wait for one to be returned.  At
+    most size idle connections are kept across all timeouts, and the least recently returned is dropped first.
+    """
+
+    def __init__(self, factory, size=gsuite.HTTP_POOL_SIZE):
+        """
+        :param factory: Callable taking a timeout and returning a new authorized connection
+        :param size: Maximum number of connections
+        """
+        self.factory = factory
+        self.size = size
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = deque()  # (timeout, connection) of idle connections, most recently returned last
+        self._lock = threading.Lock()
+
+    def _checkout(self, timeout):
+        """ Removes and returns the most recently returned idle connection with timeout, or None """
+        with self._lock:
+            for i in range(len(self._idle) - 1, -1, -1):
+                if self._idle[i][0] == timeout:
+                    http = self._idle[i][1]
+                    del self._idle[i]
+                    return http
+        return None
+
+    def _return(self, timeout, http):
+        with self._lock:
+            self._idle.append((timeout, http))
+            while len(self._idle) > self.size:
+                self._idle.popleft()
+
+    @contextmanager
+    def connection(self, timeout=None, keep_on=()):
+        """
+        Checks out a connection for the calling thread, reusing an idle one when possible.  A connection that raised
+        anything other than the exception types in keep_on may be left in a bad state, so it is discarded.
+        :param timeout: Socket timeout in seconds of the connection
+        :param keep_on: Exception types after which the connection is still usable, such as an http error status
+        """
+        self._slots.acquire()
+        try:
+            http = self._checkout(timeout)
+            if http is None:
+                http = self.factory(timeout)
+
+            try:
+                yield http
+            except keep_on:
+                self._return(timeout, http)
+                raise
+            except BaseException:
+                logger.debug('Discarding pooled connection after a failed request')
+                raise
+            else:
+                self._return(timeout, http)
+        finally:
+            self._slots.release()
+
+
+class ConcurrencyLimiter(object):
+    """
+    Caps the number of requests in flight with additive increase, multiplicative decrease.  Each response that is
+    not throttled raises the cap by about one per cap's worth of responses, and a 429 or 503 cuts it by decrease.
+    Throttled responses to requests sent before the last cut do not cut it again, so one burst counts once.
+    """
+
+    THROTTLE_STATUSES = frozenset([429, 503])
+
+    def __init__(self, initial=gsuite.MAX_WORKERS, limits=(1, gsuite.HTTP_POOL_SIZE), decrease=0.5):
+        """
+        :param initial: Cap at the start
+        :param limits: Tuple (lowest, highest) cap
+        :param decrease: Factor applied to the cap on a throttled response
+        """
+        self.low, self.high = limits
+        self.limit = float(min(max(initial, self.low), self.high))
+        self.decrease = decrease
+        self.in_flight = 0
+        self._epoch = 0  # number of cuts so far
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        """ Waits until a request may be sent, and adjusts the cap by how the request inside the block ended """
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+            epoch = self._epoch
+
+        healthy = throttled = False
+        try:
+            yield
+            healthy = True
+        except googleapiclient.errors.HttpError as e:
+            throttled = int(e.resp.get('status', 0)) in self.THROTTLE_STATUSES
+            healthy = not throttled
+            raise
+        finally:
+            with self._cond:
+                self.in_flight -= 1
+                if throttled and epoch == self._epoch:
+                    self.limit = max(self.low, self.limit * self.decrease)
+                    self._epoch += 1
+                    logger.info('Throttled, limiting to {} concurrent requests'.format(int(self.limit)))
+                elif healthy:
+                    self.limit = min(self.high, self.limit + 1 / self.limit)
+                self._cond.notify_all()
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is retried and how long to wait first.  Delays grow exponentially with full
+    jitter unless the response carries Retry-After.  Each request has its own limit on retries, and all requests
+    share a budget, so that a service failing outright fails requests quickly instead of stalling a run.
+    """
+
+    RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+    def __init__(self, attempts=gsuite.RETRY_ATTEMPTS, budget=gsuite.RETRY_BUDGET, delay=gsuite.RETRY_DELAY,
+                 sleep=time.sleep):
+        """
+        :param attempts: Retries allowed for a single request
+        :param budget: Retries allowed across every request
+        :param delay: Tuple (first, largest) backoff delay in seconds.  A longer Retry-After is not waited for
+        :param sleep: Function used to wait, replaceable in tests
+        """
+        self.attempts = attempts
+        self.budget = budget
+        self.base_delay, self.max_delay = delay
+        self.sleep = sleep
+        self._lock = threading.Lock()
+
+    def retryable(self, error):
+        """
+        True for a rate limit or server error status, and for connection errors other than timeouts.  A timed out
+        request already took its whole timeout, such as DRAWING_TIMEOUT for a slow drawing, so it is not retried.
+        """
+        if isinstance(error, googleapiclient.errors.HttpError):
+            return int(error.resp.get('status', 0)) in self.RETRY_STATUSES
+        if isinstance(error, socket.timeout):
+            return False
+        return isinstance(error, (IOError, httplib2.HttpLib2Error))
+
+    @staticmethod
+    def retry_after(error):
+        """ Returns the Retry-After of an HttpError in seconds, or None if it has none """
+        resp = getattr(error, 'resp', None)
+        value = resp.get('retry-after') if resp is not None else None
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            date = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            return None
+        return max(0.0, date.timestamp() - time.time())
+
+    def backoff(self, attempt, error):
+        """ Returns the delay in seconds before retry number attempt, or None if it should not be retried """
+        retry_after = self.retry_after(error)
+        if retry_after is not None:
+            return retry_after if retry_after <= self.max_delay else None
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def wait(self, attempt, error):
+        """
+        Waits before retrying a request that failed with error, if it should be retried
+        :param attempt: Number of retries of this request so far
+        :param error: Exception raised by the request
+        :return: True after waiting, or False if the request should fail with error
+        """
+        if attempt >= self.attempts or not self.retryable(error):
+            return False
+        delay = self.backoff(attempt, error)
+        if delay is None:
+            return False
+        with self._lock:
+            if self.budget <= 0:
+                return False
+            self.budget -= 1
+
+        self.sleep(delay)
+        return True
+
+
 class Client(object):
     """ Wraps a googleapiclient service object with functionality needed by multiple GSuite modules """
 
     HttpError = googleapiclient.errors.HttpError
 
-    def __init__(self, service="drive", scope='https://www.googleapis.com/auth/drive'):
+    def __init__(self, service="drive", scope='https://www.googleapis.com/auth/drive',
+                 pool_size=gsuite.HTTP_POOL_SIZE):
+        self.credentials = None
+        self.http_pool = HttpPool(self.authorized_http, size=pool_size)
+        self.retry_policy = RetryPolicy()
+        self.limiter = ConcurrencyLimiter()
         self.service = self.start(service, scope)
 
     def start(self, service_name, scope='https://www.googleapis.com/auth/drive'):
@@ -52,9 +256,11 @@ class Client(object):
             else:
                 raise NotImplementedError(oa_tools.message_if_missing(client_secrets))
 
+        self.credentials = credentials
+
         # noinspection PyBroadException
         try:
-            http = credentials.authorize(httplib2.Http())
+            http = self.authorized_http()
             client = googleapiclient.discovery.build(serviceName=service_name, version="v2", http=http,
                                                      cache_discovery=False)
             client.http = http  # directly expose http without using 'protected' _http
@@ -75,18 +281,47 @@ class Client(object):
         client_secret = secrets['client_secret']
         return not client_id.startswith('<GET') and not client_secret.startswith('<GET')
 
-    def request(self, url, **kwargs):
+    def authorized_http(self, timeout=None):
         """
-        Sends an http request using underlying authenticated httplib2 object from the google api client. 
+        Creates a new httplib2 connection authorized with the client credentials.  httplib2 is not thread-safe,
+        so each thread issuing requests needs its own connection.
+        :param timeout: Optional socket timeout in seconds for requests sent over this connection
+        :return: Authorized httplib2.Http object
+        """
+        return self.credentials.authorize(httplib2.Http(timeout=timeout))
+
+    def request(self, url, http=None, timeout=None, **kwargs):
+        """
+        Sends an http request over a connection checked out of self.http_pool, so it is safe to call from any
+        thread.  Requests wait for a slot from self.limiter, and rate limited, server error, and connection failures
+        are retried according to self.retry_policy.
         :param url: URL to request 
+        :param http: Optional authorized httplib2 object to send the request with instead of a pooled connection
+        :param timeout: Optional socket timeout in seconds, ignored when http is given
         :param kwargs: Optional request args such as header, body, etc. 
         :return: Tuple consisting of response code and content 
         """
+        attempt = 0
+        while True:
+            try:
+                with self.limiter.slot():
+                    if http is not None:
+                        return self.send(http, url, **kwargs)
+                    with self.http_pool.connection(timeout, keep_on=self.HttpError) as pooled:
+                        return self.send(pooled, url, **kwargs)
+            except (self.HttpError, IOError, httplib2.HttpLib2Error) as e:
+                if not self.retry_policy.wait(attempt, e):
+                    if isinstance(e, self.HttpError):
+                        logger.critical('status {} returned for url {}'.format(e.resp.get('status'), url))
+                    raise
+                attempt += 1
+                logger.info('Retry {} for url {} after {!r}'.format(attempt, url, e))
 
+    def send(self, http, url, **kwargs):
+        """ Sends a single request over http, raising HttpError for any status other than 200 """
         try:
-            response, content = self.service.http.request(url, **kwargs)
+            response, content = http.request(url, **kwargs)
             if response['status'] != '200':
-                logger.critical('status {} returned for url {}'.format(response['status'], url))
                 logger.debug('response = {}'.format(response))
                 logger.debug('content = {}'.format(content))
                 raise self.HttpError(resp=response, content=content, uri=url)
@@ -121,13 +356,34 @@ class Client(object):
                 title, drive = KIOutils.split_title(choice.name)
                 logger.info('Chose file "{}" from service "{}"'.format(title, drive))
 
-        revisions = self.service.revisions().list(fileId=file_id, fields='items(id)').execute()
-        max_revs = revisions['items'][-1]['id']
+        choice = gsuite.FileChoice(str(file_id), title, drive, self.max_revisions(file_id))
+        logger.debug('Choice is {}'.format(choice))
+        return choice
+
+    def get_file_choice(self, file_id):
+        """
+        Looks up a file by id without user interaction.
+        :param file_id: Unique GSuite file ID
+        :return: FileChoice named tuple with id, title, drive, and max revisions
+        """
+        metadata = self.service.files().get(fileId=file_id, fields='title, mimeType').execute(
+            num_retries=gsuite.RETRY_ATTEMPTS)
+        mime_type = metadata['mimeType']
+        if not mime_type.startswith(gsuite.MIME_PREFIX):
+            raise NotImplementedError('{} is not a G Suite file'.format(mime_type))
 
-        choice = gsuite.FileChoice(str(file_id), title, drive, int(max_revs))
+        title = KIOutils.strip_invalid_characters(metadata['title'])
+        drive = mime_type[len(gsuite.MIME_PREFIX):]
+        choice = gsuite.FileChoice(str(file_id), title, drive, self.max_revisions(file_id))
         logger.debug('Choice is {}'.format(choice))
         return choice
 
+    def max_revisions(self, file_id):
+        """ Returns the id of the latest revision of file_id """
+        revisions = self.service.revisions().list(fileId=file_id, fields='items(id)').execute(
+            num_retries=gsuite.RETRY_ATTEMPTS)
+        return int(revisions['items'][-1]['id'])
+
     def list_all_files(self):
         """
         Retrieve a list of File resources from the google API client. 
@@ -146,7 +402,7 @@ class Client(object):
                     param['pageToken'] = page_token
 
                 try:
-                    files = self.service.files().list(**param).execute()
+                    files = self.service.files().list(**param).execute(num_retries=gsuite.RETRY_ATTEMPTS)
                 except googleapiclient.errors.HttpError:
                     logger.error('Failed to retrieve list of files', exc_info=True)
                     break
@@ -159,11 +415,13 @@ class Client(object):
 
     def email_address(self):
         """ Returns email address for the currently authenticated user """
-        about_me = self.service.about().get(fields='user(emailAddress)').execute()
+        about_me = self.service.about().get(fields='user(emailAddress)').execute(num_retries=gsuite.RETRY_ATTEMPTS)
         return about_me['user']['emailAddress']
 
     def fetch_comments(self, file_id, fields):
-        contents = self.service.comments().list(fileId=file_id, includeDeleted=True, fields=fields).execute()
+        request = self.service.comments().list(fileId=file_id, includeDeleted=True, fields=fields)
+        with self.limiter.slot():
+            contents = request.execute(num_retries=gsuite.RETRY_ATTEMPTS)
         comments = contents['items']
         return comments
 
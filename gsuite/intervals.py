@@ -0,0 +1,113 @@
+"""Interval index used to find which suggestions cover a position in the document. """
+import random
+
+
+class _Interval(object):
+    """ Treap node ordered by (start, order) and augmented with the largest end in its subtree """
+
+    __slots__ = ('key', 'end', 'ident', 'max_end', 'priority', 'left', 'right')
+
+    def __init__(self, key, end, ident):
+        self.key = key
+        self.end = end
+        self.ident = ident
+        self.max_end = end
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+    def update(self):
+        max_end = self.end
+        if self.left and self.left.max_end > max_end:
+            max_end = self.left.max_end
+        if self.right and self.right.max_end > max_end:
+            max_end = self.right.max_end
+        self.max_end = max_end
+
+
+def _merge(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    else:
+        right.left = _merge(left, right.left)
+        right.update()
+        return right
+
+
+def _split(node, key):
+    """ Splits a treap into (nodes with key < key, nodes with key >= key) """
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    else:
+        left, node.left = _split(node.left, key)
+        node.update()
+        return left, node
+
+
+class IntervalIndex(object):
+    """
+    Closed intervals [start, end] keyed by an identifier, stored in a treap sorted by start and augmented with the
+    largest end of each subtree.  Adding, moving, or removing an interval is O(log n) and a point lookup is
+    O(log n + k) for k matches.  Matches are returned in the order their identifiers were first added, which is
+    the order a dictionary of the same identifiers would iterate in.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._keys = {}
+        self._order = 0
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, ident):
+        return ident in self._keys
+
+    def set(self, ident, start, end):
+        """ Adds the interval for ident, or moves it if ident is already present, keeping its original order """
+        if ident in self._keys:
+            order = self._remove(ident)
+        else:
+            order = self._order
+            self._order += 1
+
+        key = (start, order)
+        self._keys[ident] = key
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Interval(key, end, ident)), right)
+
+    def remove(self, ident):
+        self._remove(ident)
+
+    def _remove(self, ident):
+        """ Removes ident from the treap and returns its order """
+        start, order = key = self._keys.pop(ident)
+        left, rest = _split(self._root, key)
+        _, right = _split(rest, (start, order + 1))
+        self._root = _merge(left, right)
+        return order
+
+    def find(self, point):
+        """ Returns the identifiers of every interval containing point, in the order they were first added """
+        matches, stack = [], [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end < point:
+                continue
+            stack.append(node.left)
+            if node.key[0] <= point:
+                if node.end >= point:
+                    matches.append(node.key[1:] + (node.ident,))
+                stack.append(node.right)
+
+        return [ident for _, ident in sorted(matches)]
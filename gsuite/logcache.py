@@ -0,0 +1,123 @@
+"""On-disk cache of trimmed revision logs, so repeated runs over the same file skip the network. """
+import gzip
+import logging
+import os
+import tempfile
+
+import KIOutils
+
+logger = logging.getLogger(__name__)
+
+
+class LogCache(object):
+    """
+    Stores each trimmed revision log gzip-compressed under a name derived from (file_id, drive, start, end).
+    Reading an entry marks it as recently used, and writing evicts the least recently used entries once the cache
+    grows beyond max_bytes.
+    """
+
+    EXT = '.json.gz'
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def path(self, file_id, drive, start, end):
+        filename = '{}_{}_{}-{}{}'.format(file_id, drive, start, end, self.EXT)
+        return os.path.join(self.cache_dir, filename)
+
+    def get(self, file_id, drive, start, end):
+        """
+        Returns the cached log text for the given file and revision range
+        :return: Trimmed log text, or None on a cache miss
+        """
+        path = self.path(file_id, drive, start, end)
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                log = f.read()
+        except (IOError, OSError, EOFError):
+            return None
+
+        logger.info('Using cached log for revisions {}-{}'.format(start, end))
+        try:
+            os.utime(path, None)  # mark as recently used
+        except OSError:
+            pass
+        return log
+
+    def latest(self, file_id, drive, start, end):
+        """
+        Finds the cached log with the same file and start revision that ends closest to, but before, end
+        :return: Tuple (cached_end, log text), or (None, None) if there is no such log
+        """
+        prefix = '{}_{}_{}-'.format(file_id, drive, start)
+        ends = []
+        for _, _, path in self.entries():
+            name = os.path.basename(path)
+            if name.startswith(prefix):
+                try:
+                    cached_end = int(name[len(prefix):-len(self.EXT)])
+                except ValueError:
+                    continue
+                if start <= cached_end < end:
+                    ends.append(cached_end)
+
+        for cached_end in sorted(ends, reverse=True):
+            log = self.get(file_id, drive, start, cached_end)
+            if log is not None:
+                return cached_end, log
+        return None, None
+
+    def put(self, log, file_id, drive, start, end):
+        """
+        Compresses log into the cache, then evicts old entries beyond max_bytes
+        :param log: Trimmed log text, or an object with a dump(f) method such as StreamedLog
+        """
+        KIOutils.ensure_path(self.cache_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as raw, gzip.open(raw, 'wt', encoding='utf-8') as f:
+                if isinstance(log, str):
+                    f.write(log)
+                else:
+                    log.dump(f)
+            os.replace(tmp_path, self.path(file_id, drive, start, end))
+        except (IOError, OSError):
+            logger.exception('Failed to cache log for revisions {}-{}'.format(start, end))
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        else:
+            self.evict()
+
+    def entries(self):
+        """ Returns a list of (last_used, size, path) for each cached log """
+        try:
+            names = os.listdir(self.cache_dir)
+        except OSError:
+            return []
+
+        entries = []
+        for name in names:
+            if name.endswith(self.EXT):
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def evict(self):
+        """ Removes least recently used logs until the cache fits in max_bytes """
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        # always keep the most recent entry, even if it alone exceeds max_bytes
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            logger.debug('Evicted {} from log cache'.format(path))
+            total -= size
@@ -0,0 +1,171 @@
+"""Lazily decoded revision logs, so that a large log is never held as text and as a full json object at once. """
+import json
+import re
+from collections.abc import Mapping
+
+import gsuite
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+WRITE_BLOCK = 2 ** 20
+
+
+def skip_ws(text, i):
+    return _whitespace.match(text, i).end()
+
+
+def expect(text, i, char):
+    """ Returns the index after char at position i, or raises InvalidLogFormat """
+    if text[i:i + 1] != char:
+        raise gsuite.InvalidLogFormat('Expected {!r} at position {} of log'.format(char, i))
+    return skip_ws(text, i + 1)
+
+
+def iter_array(text, i):
+    """
+    Decodes the json array starting at text[i] one element at a time
+    :return: Generator of each decoded element
+    """
+    i = expect(text, skip_ws(text, i), '[')
+    if text[i:i + 1] == ']':
+        return
+    while True:
+        value, i = _decoder.raw_decode(text, i)
+        yield value
+        i = skip_ws(text, i)
+        if text[i:i + 1] == ']':
+            return
+        i = expect(text, i, ',')
+
+
+def skip_value(text, i):
+    """ Returns the index following the json value at text[i], decoding arrays one element at a time """
+    if text[i:i + 1] != '[':
+        return _decoder.raw_decode(text, i)[1]
+
+    i = expect(text, i, '[')
+    if text[i:i + 1] == ']':
+        return i + 1
+    while True:
+        i = skip_ws(text, _decoder.raw_decode(text, i)[1])
+        if text[i:i + 1] == ']':
+            return i + 1
+        i = expect(text, i, ',')
+
+
+def index_object(text, i):
+    """
+    Finds the position of each member value of the json object starting at text[i]
+    :return: Dictionary of key -> index of its value in text
+    """
+    index = {}
+    i = expect(text, skip_ws(text, i), '{')
+    if text[i:i + 1] == '}':
+        return index
+    while True:
+        key, i = _decoder.raw_decode(text, i)
+        i = expect(text, skip_ws(text, i), ':')
+        index[key] = i
+        i = skip_ws(text, skip_value(text, i))
+        if text[i:i + 1] == '}':
+            return index
+        i = expect(text, i, ',')
+
+
+class LazyArray(object):
+    """ Iterable over the elements of one or more json arrays, decoded only as they are reached """
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __iter__(self):
+        for text, i in self.parts:
+            for value in iter_array(text, i):
+                yield value
+
+
+class StreamedLog(Mapping):
+    """
+    Read-only view of a revision log made of one or more trimmed log segments in revision order.  The
+    chunkedSnapshot of the first segment is used, and the changelog of every segment is chained and decoded one
+    entry at a time each time it is iterated.
+    """
+
+    def __init__(self, segments):
+        """
+        :param segments: List of (text, offset) where the log json in text starts at offset, which allows skipping
+        gsuite.LOG_START_CHR without copying text
+        """
+        self.segments = segments
+        self._indexes = None
+
+    @property
+    def indexes(self):
+        """ Positions of the top-level members of each segment, found on first use """
+        if self._indexes is None:
+            self._indexes = [index_object(text, offset) for text, offset in self.segments]
+        return self._indexes
+
+    def __getitem__(self, key):
+        if key == 'changelog':
+            return LazyArray([(text, index['changelog'])
+                              for (text, _), index in zip(self.segments, self.indexes) if 'changelog' in index])
+        text = self.segments[0][0]
+        return _decoder.raw_decode(text, self.indexes[0][key])[0]
+
+    def __iter__(self):
+        return iter(self.indexes[0])
+
+    def __len__(self):
+        return len(self.indexes[0])
+
+    def load(self):
+        """ Returns the log as a plain dictionary, as json.loads would, with the changelog of every segment """
+        logs = [_decoder.raw_decode(text, skip_ws(text, offset))[0] for text, offset in self.segments]
+        log = logs[0]
+        for other in logs[1:]:
+            log.setdefault('changelog', []).extend(other.get('changelog', []))
+        return log
+
+    def dump(self, f, indent=None):
+        """
+        Writes the log as json text to the text file f without building the full text in memory
+        :param indent: Optional indent, which writes the same text as json.dumps(log, indent=indent) one changelog
+        entry at a time
+        """
+        if indent is not None:
+            return self._dump_indented(f, indent)
+        if len(self.segments) == 1:
+            text, offset = self.segments[0]
+            for i in range(offset, len(text), WRITE_BLOCK):
+                f.write(text[i:i + WRITE_BLOCK])
+            return
+
+        f.write('{')
+        for n, key in enumerate(self):
+            f.write('{}{}: '.format(', ' if n else '', json.dumps(key)))
+            if key == 'changelog':
+                f.write('[')
+                for m, entry in enumerate(self[key]):
+                    f.write('{}{}'.format(', ' if m else '', json.dumps(entry)))
+                f.write(']')
+            else:
+                f.write(json.dumps(self[key]))
+        f.write('}')
+
+    def _dump_indented(self, f, indent):
+        pad = ' ' * indent
+        f.write('{')
+        for n, key in enumerate(self):
+            f.write('{}\n{}{}: '.format(',' if n else '', pad, json.dumps(key)))
+            if key != 'changelog':
+                f.write(json.dumps(self[key], indent=indent).replace('\n', '\n' + pad))
+                continue
+
+            f.write('[')
+            m = -1
+            for m, entry in enumerate(self[key]):
+                text = json.dumps(entry, indent=indent).replace('\n', '\n' + pad * 2)
+                f.write('{}\n{}{}'.format(',' if m else '', pad * 2, text))
+            f.write('\n{}]'.format(pad) if m >= 0 else ']')
+        f.write('\n}' if len(self) else '}')
@@ -0,0 +1,175 @@
+"""Piece table used to replay text edits from a revision log without rebuilding the document on every action. """
+import random
+
+
+class _Piece(object):
+    """ Treap node referencing length characters of buf starting at start, with an optional tag for the piece """
+
+    __slots__ = ('buf', 'start', 'length', 'tag', 'size', 'priority', 'left', 'right')
+
+    def __init__(self, buf, start, length, tag=None):
+        self.buf = buf
+        self.start = start
+        self.length = length
+        self.tag = tag
+        self.size = length
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+
+    def update(self):
+        self.size = self.length + _size(self.left) + _size(self.right)
+
+
+def _size(node):
+    return node.size if node else 0
+
+
+def _merge(left, right):
+    """ Joins two treaps where every character in left precedes every character in right """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    else:
+        right.left = _merge(left, right.left)
+        right.update()
+        return right
+
+
+def _copy(node):
+    """ Returns a new treap with the same pieces as node """
+    if node is None:
+        return None
+    new = _Piece(node.buf, node.start, node.length, node.tag)
+    new.priority = node.priority
+    new.left, new.right = _copy(node.left), _copy(node.right)
+    new.update()
+    return new
+
+
+def _split(node, index):
+    """ Splits a treap into (first index characters, remaining characters), cutting a piece in two if needed """
+    if node is None:
+        return None, None
+
+    left_size = _size(node.left)
+    if index <= left_size:
+        left, node.left = _split(node.left, index)
+        node.update()
+        return left, node
+
+    index -= left_size
+    if index >= node.length:
+        node.right, right = _split(node.right, index - node.length)
+        node.update()
+        return node, right
+
+    # index falls inside this piece, so the tail becomes its own node
+    tail = _Piece(node.buf, node.start + index, node.length - index, node.tag)
+    right, node.right = node.right, None
+    node.length = index
+    node.update()
+    return node, _merge(tail, right)
+
+
+class PieceTable(object):
+    """
+    Text buffer backed by a piece table stored in an implicit treap.  Inserts and deletes run in O(log n) of the
+    number of pieces and never copy document text; the final string is only materialized by str().
+
+    Indices follow python slice semantics so that PieceTable gives the same result as the string functions
+    `insert` and `delete` in `gsuite.docshandler`, including negative and out of range indices.
+
+    Each insert may carry a tag, such as the author of the text, which follows its characters through later edits
+    and is reported by spans().
+    """
+
+    def __init__(self, text='', tag=None):
+        self._root = _Piece(text, 0, len(text), tag) if text else None
+
+    def __len__(self):
+        return _size(self._root)
+
+    def __str__(self):
+        return self.getvalue()
+
+    def _clamp(self, index):
+        """ Normalizes index the same way a python slice bound is normalized """
+        length = len(self)
+        if index < 0:
+            index = max(0, index + length)
+        return min(index, length)
+
+    def insert(self, index, text, tag=None):
+        """ Inserts text before position index, equivalent to old[:index] + text + old[index:] """
+        if not text:
+            return
+        left, right = _split(self._root, self._clamp(index))
+        self._root = _merge(_merge(left, _Piece(text, 0, len(text), tag)), right)
+
+    def delete(self, start, end):
+        """ Removes characters in [start, end), equivalent to old[:start] + old[end:] """
+        start, end = self._clamp(start), self._clamp(end)
+        if end < start:
+            # old[:start] + old[end:] repeats old[end:start], same as a slice the string functions produce
+            left, rest = _split(self._root, end)
+            middle, right = _split(rest, start - end)
+            copy = _copy(middle)  # copied before merging, which relinks the nodes of middle
+            self._root = _merge(_merge(left, middle), _merge(copy, right))
+            return
+        left, rest = _split(self._root, start)
+        _, right = _split(rest, end - start)
+        self._root = _merge(left, right)
+
+    def slice(self, start, end):
+        """ Returns the text in [start, end) without modifying the table """
+        start, end = self._clamp(start), self._clamp(end)
+        if end <= start:
+            return ''
+        left, rest = _split(self._root, start)
+        middle, right = _split(rest, end - start)
+        text = self._join(middle)
+        self._root = _merge(_merge(left, middle), right)
+        return text
+
+    def spans(self):
+        """
+        Run-length encodes the tags of the text, joining neighbouring pieces with equal tags
+        :return: Generator of (start, end, tag) covering the text in order
+        """
+        start, end, tag = 0, 0, None
+        for node in self._pieces(self._root):
+            if node.tag != tag and end > start:
+                yield start, end, tag
+                start = end
+            tag = node.tag
+            end += node.length
+        if end > start:
+            yield start, end, tag
+
+    def getvalue(self):
+        """ Materializes the full text """
+        return self._join(self._root)
+
+    @staticmethod
+    def _pieces(node):
+        """ In-order traversal of the treap """
+        stack = []
+        while stack or node:
+            if node:
+                stack.append(node)
+                node = node.left
+            else:
+                node = stack.pop()
+                yield node
+                node = node.right
+
+    @classmethod
+    def _join(cls, node):
+        """ Joins the text of each piece """
+        return ''.join([piece.buf[piece.start:piece.start + piece.length] for piece in cls._pieces(node)])
@@ -0,0 +1,61 @@
+"""Per-revision text history, stored as the text before the first revision plus the text edits of each revision. """
+import io
+import json
+import os
+
+from gsuite.piecetable import PieceTable
+
+BASE_FILENAME = 'revisions-base.txt'
+DIFF_FILENAME = 'revisions-diff.jsonl'
+
+
+def apply_edit(text_buffer, edit):
+    """ Applies an edit to text_buffer, a PieceTable: [index, string] inserts and [start, end] deletes """
+    if isinstance(edit[1], str):
+        text_buffer.insert(edit[0], edit[1])
+    else:
+        text_buffer.delete(edit[0], edit[1])
+
+
+def dump_revision(rev, edits):
+    """ Returns the diff line for the edits of one revision """
+    return json.dumps([rev, edits], ensure_ascii=False)
+
+
+class RevisionHistory(object):
+    """ Rebuilds the text at any revision from a base text and the diff lines written by RevisionsParser """
+
+    def __init__(self, base_text, diff_lines):
+        self.base_text = base_text
+        self.revs, self.edits = [], []
+        for line in diff_lines:
+            if line.strip():
+                rev, edits = json.loads(line)
+                self.revs.append(rev)
+                self.edits.append(edits)
+
+    @classmethod
+    def load(cls, directory):
+        """ Reads BASE_FILENAME and DIFF_FILENAME from directory, keeping line endings of the base text as written """
+        with io.open(os.path.join(directory, BASE_FILENAME), encoding='utf-8', newline='') as f:
+            base_text = f.read()
+        with io.open(os.path.join(directory, DIFF_FILENAME), encoding='utf-8') as f:
+            return cls(base_text, f)
+
+    def text_at(self, rev):
+        """ Returns the text after every edit up to and including revision rev """
+        text_buffer = PieceTable(self.base_text)
+        for edit_rev, edits in zip(self.revs, self.edits):
+            if edit_rev > rev:
+                break
+            for edit in edits:
+                apply_edit(text_buffer, edit)
+        return text_buffer.getvalue()
+
+    def __iter__(self):
+        """ Yields (rev, text) for each revision that changed the text, in order """
+        text_buffer = PieceTable(self.base_text)
+        for rev, edits in zip(self.revs, self.edits):
+            for edit in edits:
+                apply_edit(text_buffer, edit)
+            yield rev, text_buffer.getvalue()
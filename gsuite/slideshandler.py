@@ -3,7 +3,8 @@ import os
 
 from baseclass import Handler, Parser
 # noinspection PyUnresolvedReferences
-from gsuite.docshandler import ImageParser, CommentsParser, create_obj_list, insert, delete
+from gsuite.docshandler import ImageParser, CommentsParser, create_obj_list
+from gsuite.piecetable import PieceTable
 
 INDEX_OFFSET = 0
 logger = logging.getLogger(__name__)
@@ -144,7 +145,7 @@ class PlainTextParser(Parser):
         return kumo_list
 
     def make_pt_obj(self, filename, box, box_dict):
-        content = box_dict[box]['string'].encode('utf8')
+        content = box_dict[box]['string'].getvalue().encode('utf8')
         return self.KumoObj(filename=filename, content=content)
 
 
@@ -156,9 +157,9 @@ class Presentation(object):
         self.functions = {15: self.add_text, 4: self.parse_mts, 16: self.del_text, 3: self.add_box,
                           12: self.add_slide, 13: self.del_slide, 0: self.del_box, 14: self.move_slide}
         self.slide_dict = {'p': ['i0', 'i1', 'i3']}
-        self.box_dict = {'i0': {'slide': 'p', 'string': ''},
-                         'i1': {'slide': 'p', 'string': ''},
-                         'i3': {'slide': 'p', 'string': ''}}
+        self.box_dict = {'i0': {'slide': 'p', 'string': PieceTable()},
+                         'i1': {'slide': 'p', 'string': PieceTable()},
+                         'i3': {'slide': 'p', 'string': PieceTable()}}
         self.slide_list = ['p']
         self.logger = logger
         self.data = self.trim_log(log)
@@ -199,9 +200,7 @@ class Presentation(object):
         box_dest = line[1]
         add_string = line[4]
         index = line[3]
-        old_string = self.box_dict[box_dest]['string']
-        new_string = insert(old_string, add_string, index, index_offset=INDEX_OFFSET)
-        self.box_dict[box_dest]['string'] = new_string
+        self.box_dict[box_dest]['string'].insert(index + INDEX_OFFSET, add_string)
 
     def parse_mts(self, data):
         """ Parse each line entry separately in the multiset """
@@ -213,9 +212,7 @@ class Presentation(object):
         """ Deletes the given range from the string at the given box """
         box_dest = line[1]
         start_i, end_i = line[3], line[4]
-        old_string = self.box_dict[box_dest]['string']
-        new_string = delete(old_string, start_i, end_i, index_offset=INDEX_OFFSET)
-        self.box_dict[box_dest]['string'] = new_string
+        self.box_dict[box_dest]['string'].delete(start_i + INDEX_OFFSET, end_i)
 
     def add_box(self, line):
         """ Adds a new box to the collection of boxes"""
@@ -225,7 +222,7 @@ class Presentation(object):
             slide = slide.replace(':notes', '')
         box_id = line[1]
         box_attrib['slide'] = slide
-        box_attrib['string'] = ''
+        box_attrib['string'] = PieceTable()
         self.box_dict[box_id] = box_attrib
 
         if slide in self.slide_dict:
@@ -1,5 +1,8 @@
 import logging
+import os
 import sys
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
 import click
 
@@ -8,13 +11,40 @@ import gsuite.driver
 LEVEL_DEFAULT = logging.INFO
 CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
 
+ManifestEntry = namedtuple('ManifestEntry', 'file_id start end')
+BatchResult = namedtuple('BatchResult', 'file_id status detail')
+
 
 @click.command(context_settings=CONTEXT_SETTINGS)
 @click.option('--log-level', default='info', type=click.Choice(['notset', 'debug', 'info', 'warning', 'error',
                                                                 'critical']), help='Controls the logging level')
 @click.option('--log-dir', default='config', help='Sets the default logging directory (NOTE: disabled)')
-def cli(log_level, log_dir):
-    main(log_level, log_dir)
+@click.option('--stream-log', is_flag=True, help='Decodes Docs revision logs one entry at a time to reduce memory use')
+@click.option('--batch', 'manifest', type=click.File('r'), default=None,
+              help='Processes every file listed in MANIFEST (or - for stdin) without prompting.  Each line holds '
+                   '"file_id [start [end]]"')
+@click.option('--workers', type=click.IntRange(min=1), default=None,
+              help='Number of processes used by --batch, defaults to the number of cores')
+@click.option('--incremental', is_flag=True,
+              help='Saves each flattened Docs log, and flattens only newer revisions when the same file and start '
+                   'revision is processed again')
+@click.option('--revisions', is_flag=True,
+              help='Also exports the text of every Docs revision as revisions-base.txt and revisions-diff.jsonl')
+@click.option('--attribution', is_flag=True,
+              help='Also writes the author and revision of each range of Docs plain text to attribution.txt')
+def cli(log_level, log_dir, stream_log, manifest, workers, incremental, revisions, attribution):
+    options = parser_options(revisions=revisions, attribution=attribution)
+    if manifest:
+        results = batch(log_level, manifest, stream_log, workers, incremental, options)
+        if any(result.status == 'failed' for result in results):
+            raise SystemExit(1)
+    else:
+        main(log_level, log_dir, stream_log, incremental, options)
+
+
+def parser_options(**flags):
+    """ Returns the names of the optional parsers enabled by flags, see baseclass.Parser.option """
+    return tuple(sorted(name for name, enabled in flags.items() if enabled))
 
 
 def start_logger(loglevel, handler=logging.StreamHandler):
@@ -38,18 +68,136 @@ def start_logger(loglevel, handler=logging.StreamHandler):
     return kumologger
 
 
-def main(log_level, log_dir):
+def main(log_level, log_dir, stream_log=False, incremental=False, options=()):
     # TODO arg handling
     logger = start_logger(log_level)
     logger.info('Starting Kumodocs with log level of {} and log dir of {}'.format(log_level, log_dir))
-    driver = gsuite.driver.GSuiteDriver()
+    driver = gsuite.driver.GSuiteDriver(stream_log=stream_log, incremental=incremental, options=options)
     choice = driver.choose_file()
     start, end = driver.prompt_rev_range()
+    run_pipeline(driver, choice, start, end)
+
+
+def run_pipeline(driver, choice, start, end):
+    """ Retrieves, flattens, and recovers objects from the log of choice, and writes them to disk """
     log = driver.get_log(start=start, end=end)
     flat_log = driver.flatten_log(log)
     objects = driver.recover_objects(log=log, flat_log=flat_log, choice=choice)
     driver.write_objects(*objects)
 
 
+def read_manifest(lines):
+    """
+    Parses a batch manifest.  Each line holds a file id optionally followed by start and end revisions; blank lines
+    and anything after # are ignored.
+    :param lines: Iterable of manifest lines, such as an open file
+    :return: List of ManifestEntry, with None for any revision not given
+    """
+    entries = []
+    for num, line in enumerate(lines, 1):
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) > 3:
+            raise ValueError('Manifest line {}: expected "file_id [start [end]]"'.format(num))
+        try:
+            revisions = [int(field) for field in fields[1:]]
+        except ValueError:
+            raise ValueError('Manifest line {}: revisions must be integers'.format(num))
+        revisions.extend([None] * (2 - len(revisions)))
+        entries.append(ManifestEntry(fields[0], *revisions))
+    return entries
+
+
+def batch(log_level, manifest, stream_log=False, workers=None, incremental=False, options=()):
+    """
+    Runs the full pipeline for every file in manifest without prompting, continuing past files that fail.  Files
+    are spread over a pool of worker processes, each with its own driver and client, so that downloads in one
+    worker overlap with flattening and text replay in the others.  Every entry of one file id runs in the same
+    worker, see process_file.
+    :param log_level: Log all events of this severity and above
+    :param manifest: Iterable of manifest lines, see read_manifest
+    :param stream_log: Decodes Docs revision logs one entry at a time
+    :param workers: Number of worker processes, defaults to the number of cores.  1 runs in this process
+    :param incremental: Resumes saved flat logs of Docs files, see GSuiteDriver
+    :param options: Names of optional parsers to enable, see GSuiteDriver
+    :return: List of BatchResult, one per manifest entry in manifest order
+    """
+    logger = start_logger(log_level)
+    entries = read_manifest(manifest)
+    by_file = OrderedDict()
+    for position, entry in enumerate(entries):
+        by_file.setdefault(entry.file_id, []).append((position, entry))
+    groups = list(by_file.values())
+    workers = min(workers or os.cpu_count() or 1, len(groups) or 1)
+    logger.info('Starting Kumodocs batch of {} files with {} workers'.format(len(entries), workers))
+
+    file_entries = [[entry for _, entry in group] for group in groups]
+    if workers == 1:
+        init_worker(log_level=None, stream_log=stream_log, incremental=incremental, options=options)
+        processed = [process_file(group) for group in file_entries]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(log_level, stream_log, incremental, options)) as pool:
+            processed = list(pool.map(process_file, file_entries))
+
+    results = [None] * len(entries)
+    for group, group_results in zip(groups, processed):
+        for (position, _), result in zip(group, group_results):
+            results[position] = result
+
+    report_batch(results)
+    return results
+
+
+_worker_driver = None
+
+
+def init_worker(log_level, stream_log, incremental=False, options=()):
+    """ Creates the driver used by process_file in this process """
+    global _worker_driver
+    if log_level:
+        start_logger(log_level)
+    _worker_driver = gsuite.driver.GSuiteDriver(stream_log=stream_log, unique_dirs=True, incremental=incremental,
+                                                options=options)
+
+
+def process_file(entries):
+    """
+    Runs the full pipeline for each manifest entry of one file, in order, with the driver created by init_worker.
+    An entry whose revision range resolves to one already processed, such as "abc" and "abc 1 75" when 75 is the
+    latest revision, would write the same directory and is skipped.
+    :param entries: List of ManifestEntry with the same file_id
+    :return: List of BatchResult in the order of entries, with status ok and the output directory, failed and
+    the error, or skipped
+    """
+    driver = _worker_driver
+    done, results = set(), []
+    for entry in entries:
+        try:
+            choice, start, end = driver.select_file(entry.file_id, start=entry.start, end=entry.end)
+            if (start, end) in done:
+                results.append(BatchResult(entry.file_id, 'skipped',
+                                           'duplicate of revisions {}-{}'.format(start, end)))
+                continue
+            run_pipeline(driver, choice, start, end)
+        except (Exception, SystemExit) as e:
+            logging.getLogger('kumodocs').exception('Failed to process {}'.format(entry.file_id))
+            results.append(BatchResult(entry.file_id, 'failed', str(e)))
+        else:
+            done.add((start, end))
+            results.append(BatchResult(entry.file_id, 'ok', driver.make_base_path()))
+    return results
+
+
+def report_batch(results):
+    """ Prints the status of each file in a batch followed by a summary """
+    for result in results:
+        print('{:<8}{}  {}'.format(result.status, result.file_id, result.detail))
+    ok = sum(1 for result in results if result.status == 'ok')
+    failed = sum(1 for result in results if result.status == 'failed')
+    print('\n{} of {} files processed, {} failed'.format(ok, len(results), failed))
+
+
 if __name__ == '__main__':
     cli(sys.argv[1:])
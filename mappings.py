@@ -142,6 +142,26 @@ list insertion associated with epm: le_nb
 --- '''
 
 
+_KEY_CACHE_SIZE = 4096
+_key_cache = {}
+
+
 def remap(old_key):
     """ Remaps given key if present in mapping dictionary, or returns old_key otherwise """
     return _MAPPINGS.get(old_key, old_key)
+
+
+def remap_keys(log_dict):
+    """
+    Returns a copy of log_dict with every key remapped, recursing into nested dictionaries.  Preserves order.
+    The remapped keys of each distinct key tuple are computed once, since log entries repeat a small set of shapes.
+    """
+    keys = tuple(log_dict)
+    new_keys = _key_cache.get(keys)
+    if new_keys is None:
+        if len(_key_cache) >= _KEY_CACHE_SIZE:
+            _key_cache.clear()
+        new_keys = _key_cache[keys] = tuple(_MAPPINGS.get(key, key) for key in keys)
+
+    return {new_key: remap_keys(value) if isinstance(value, dict) else value
+            for new_key, value in zip(new_keys, log_dict.values())}
@@ -0,0 +1,21 @@
+import json
+import os
+
+import pytest
+
+from gsuite.docshandler import DocsHandler
+
+SAMPLE = os.path.join(os.path.dirname(__file__), 'samples', 'docstest', 'revision-log.txt')
+
+
+@pytest.fixture
+def sample_log():
+    """ Revision log of the docstest sample document, loaded anew for each test since flattening changes it """
+    with open(SAMPLE) as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def flat_log(sample_log):
+    """ Flat log of the docstest sample document """
+    return DocsHandler(client=None, parsers=[]).flatten_log(sample_log)
@@ -0,0 +1,95 @@
+import os
+
+import pytest
+
+import gsuite
+import kumodocs
+from gsuite.driver import GSuiteDriver
+
+
+class FakeDriver(object):
+    """ Resolves every file to 75 revisions and records the revision ranges it runs """
+
+    def __init__(self, **kwargs):
+        self.runs = []
+        self.choice = None
+        self.choice_start = self.choice_end = None
+
+    def select_file(self, file_id, start=None, end=None):
+        if file_id == 'bad':
+            raise ValueError('Invalid revision range')
+        self.choice = gsuite.FileChoice(file_id, 'title', 'document', 75)
+        self.choice_start, self.choice_end = start or 1, end or 75
+        return self.choice, self.choice_start, self.choice_end
+
+    def get_log(self, start, end):
+        self.runs.append((self.choice.file_id, start, end))
+        return {}
+
+    def flatten_log(self, log):
+        return []
+
+    def recover_objects(self, log, flat_log, choice):
+        return []
+
+    def write_objects(self, *objects):
+        pass
+
+    def make_base_path(self):
+        return '{}/{}-{}'.format(self.choice.file_id, self.choice_start, self.choice_end)
+
+
+# noinspection PyClassHasNoInit
+class TestReadManifest:
+    def test_entries(self):
+        lines = ['abc\n', '\n', '# comment\n', 'def 5  # from 5\n', 'ghi 2 10\n']
+        assert kumodocs.read_manifest(lines) == [kumodocs.ManifestEntry('abc', None, None),
+                                                 kumodocs.ManifestEntry('def', 5, None),
+                                                 kumodocs.ManifestEntry('ghi', 2, 10)]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            kumodocs.read_manifest(['abc 1 2 3'])
+        with pytest.raises(ValueError):
+            kumodocs.read_manifest(['abc one'])
+
+
+# noinspection PyClassHasNoInit
+class TestBatch:
+    def test_duplicates_after_resolving_range(self, monkeypatch):
+        monkeypatch.setattr(kumodocs.gsuite.driver, 'GSuiteDriver', FakeDriver)
+        results = kumodocs.batch('critical', ['abc\n', 'other\n', 'abc 1\n', 'abc 1 75\n', 'abc 2\n', 'bad\n'],
+                                 workers=1)
+        assert [result.status for result in results] == ['ok', 'ok', 'skipped', 'skipped', 'ok', 'failed']
+        assert results[0].detail == 'abc/1-75' and results[4].detail == 'abc/2-75'
+        assert kumodocs._worker_driver.runs == [('abc', 1, 75), ('abc', 2, 75), ('other', 1, 75)]
+
+    def test_entries_of_one_file_run_together(self, monkeypatch):
+        monkeypatch.setattr(kumodocs.gsuite.driver, 'GSuiteDriver', FakeDriver)
+        kumodocs.init_worker(log_level=None, stream_log=False)
+        results = kumodocs.process_file([kumodocs.ManifestEntry('abc', None, None),
+                                         kumodocs.ManifestEntry('abc', 1, 75)])
+        assert [result.status for result in results] == ['ok', 'skipped']
+
+
+# noinspection PyClassHasNoInit
+class TestMakeBasePath:
+    def make_driver(self, base_dir, unique_dirs):
+        driver = object.__new__(GSuiteDriver)
+        driver._base_dir = base_dir
+        driver.unique_dirs = unique_dirs
+        driver.choice = gsuite.FileChoice('abc', 'title', 'document', 75)
+        driver.choice_start, driver.choice_end = 1, 75
+        return driver
+
+    def test_unique_dirs(self, tmp_path):
+        relative = self.make_driver('downloaded', unique_dirs=True).make_base_path()
+        assert relative.endswith(os.path.join('downloaded', 'document', 'title_abc', '1-75'))
+
+        absolute = self.make_driver(str(tmp_path), unique_dirs=True).make_base_path()
+        assert absolute == os.path.join(os.path.realpath(str(tmp_path)), 'document', 'title_abc', '1-75')
+
+    def test_shared_dirs(self, tmp_path):
+        relative = self.make_driver('downloaded', unique_dirs=False).make_base_path()
+        assert relative.endswith(os.path.join('downloaded', 'document', 'title', '1-75'))
+        assert self.make_driver(str(tmp_path), unique_dirs=False).make_base_path() == os.path.realpath(str(tmp_path))
@@ -0,0 +1,22 @@
+from gsuite.docshandler import AttributionParser, DocsHandler, PlaintextParser
+
+
+# noinspection PyClassHasNoInit
+class TestAttribution:
+    def test_spans_cover_plain_text(self, flat_log):
+        plain_text = PlaintextParser.get_plain_text(flat_log)
+
+        content = AttributionParser(None).parse(None, flat_log, None)[0].content.decode('utf-8')
+        spans = [line.split('|') for line in content.split('\n')]
+        assert int(spans[0][0]) == 0
+        assert int(spans[-1][1]) == len(plain_text)
+        for prev, span in zip(spans, spans[1:]):
+            assert prev[1] == span[0]
+            assert prev[2:] != span[2:]
+        assert all(rev == 'None' or int(rev) > 0 for _, _, _, rev in spans)
+
+    def test_opt_in(self):
+        handler = DocsHandler(client=None)
+        assert not any(isinstance(parser, AttributionParser) for parser in handler.parsers)
+        handler.enable_parsers({'attribution'})
+        assert sum(isinstance(parser, AttributionParser) for parser in handler.parsers) == 1
@@ -0,0 +1,163 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+import httplib2
+import pytest
+
+import gsuite
+from gsuite.blobcache import BlobCache
+from gsuite.docshandler import DrawingsParser, ImageParser
+
+
+class RecordingClient(object):
+    """ Answers renderdata POSTs with a link per image and downloads with png content, recording each url """
+
+    HttpError = IOError
+
+    def __init__(self):
+        self.urls = []
+
+    def request(self, url, method='GET', body=None, **kwargs):
+        self.urls.append(url)
+        if method == 'POST':
+            count = body.count('cosmoId')
+            links = {'r{}'.format(i): 'https://image/{}'.format(i) for i in range(count)}
+            return httplib2.Response({'status': '200'}), (")]}'\n" + json.dumps(links)).encode()
+        response = httplib2.Response({'status': '200', 'content-disposition': 'inline; filename="x.png"'})
+        return response, url.encode()
+
+
+def slow_download(cache_dir, log_path):
+    """ Fetches one image through a BlobCache in cache_dir, appending a line to log_path for each download """
+
+    def download(keys):
+        with open(log_path, 'a') as f:
+            f.write('download\n')
+        time.sleep(0.3)
+        cache.put(keys[0], b'content', '.png')
+        return {keys[0]: (b'content', '.png')}
+
+    cache = BlobCache(cache_dir, max_bytes=2 ** 20)
+    assert cache.fetch_all([('image', 'shared')], download) == {('image', 'shared'): (b'content', '.png')}
+
+
+# noinspection PyClassHasNoInit
+class TestBlobCache:
+    def test_put_get(self, tmp_path):
+        cache = BlobCache(str(tmp_path), max_bytes=2 ** 20)
+        assert cache.get(('image', 'a')) is None
+        cache.put(('image', 'a'), b'content', '.png')
+        assert cache.get(('image', 'a')) == (b'content', '.png')
+        assert cache.get(('image', 'b')) is None
+
+    def test_same_content_stored_once(self, tmp_path):
+        cache = BlobCache(str(tmp_path), max_bytes=2 ** 20)
+        cache.put(('drawing', 'd', 10, 20), b'same', '.png')
+        cache.put(('drawing', 'd', 30, 40), b'same', '.png')
+        assert len(os.listdir(cache.blob_dir)) == 1
+        assert cache.get(('drawing', 'd', 30, 40)) == (b'same', '.png')
+
+    def test_evict(self, tmp_path):
+        cache = BlobCache(str(tmp_path), max_bytes=1)
+        cache.put(('image', 'a'), b'first', '.png')
+        os.utime(cache.entries()[0][2], (0, 0))
+        cache.put(('image', 'b'), b'second', '.png')
+        assert cache.get(('image', 'a')) is None
+        assert cache.get(('image', 'b')) == (b'second', '.png')
+
+    def test_evict_prunes_key_records(self, tmp_path):
+        cache = BlobCache(str(tmp_path), max_bytes=1)
+        cache.put(('image', 'a'), b'first', '.png')
+        cache.put(('drawing', 'a', 30, 40), b'first', '.png')
+        os.utime(cache.entries()[0][2], (0, 0))
+        cache.put(('image', 'b'), b'second', '.png')
+        assert sorted(os.listdir(cache.key_dir)) == [cache.key_name(('image', 'b')) + '.json']
+
+    def test_put_under_budget_does_not_rescan(self, tmp_path, monkeypatch):
+        cache = BlobCache(str(tmp_path), max_bytes=100)
+        cache.put(('image', 'a'), b'first', '.png')
+        monkeypatch.setattr(cache, 'entries', lambda: pytest.fail('rescanned blobs'))
+        cache.put(('image', 'b'), b'second', '.png')
+        cache.put(('image', 'c'), b'second', '.png')
+        assert cache.get(('image', 'c')) == (b'second', '.png')
+
+
+# noinspection PyClassHasNoInit
+class TestFetchAll:
+    def test_one_download_across_processes(self, tmp_path):
+        log_path = str(tmp_path / 'downloads.log')
+        processes = [multiprocessing.Process(target=slow_download, args=(str(tmp_path / 'cache'), log_path))
+                     for _ in range(4)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        assert all(process.exitcode == 0 for process in processes)
+        with open(log_path) as f:
+            assert f.read() == 'download\n'
+
+    def test_waiter_downloads_when_holder_fails(self, tmp_path):
+        holder, waiter = BlobCache(str(tmp_path), 2 ** 20), BlobCache(str(tmp_path), 2 ** 20)
+        assert holder.claim(('image', 'a'))
+        calls = []
+
+        def download(keys):
+            calls.append(keys)
+            return {key: (b'mine', '.png') for key in keys}
+
+        threading.Timer(0.1, holder.release, args=(('image', 'a'),)).start()
+        assert waiter.fetch_all([('image', 'a')], download) == {('image', 'a'): (b'mine', '.png')}
+        assert calls == [[('image', 'a')]]
+
+    def test_stale_lock_replaced(self, tmp_path):
+        cache = BlobCache(str(tmp_path), 2 ** 20, lock_timeout=10)
+        assert cache.claim(('image', 'a'))
+        assert not cache.claim(('image', 'a'))
+        os.utime(cache.lock_path(('image', 'a')), (0, 0))
+        assert cache.claim(('image', 'a'))
+        cache.release(('image', 'a'))
+        assert not os.path.exists(cache.lock_path(('image', 'a')))
+
+    def test_stale_holder_keeps_replaced_lock(self, tmp_path):
+        stale, current, third = (BlobCache(str(tmp_path), 2 ** 20, lock_timeout=10) for _ in range(3))
+        key = ('image', 'a')
+        assert stale.claim(key)
+        os.utime(stale.lock_path(key), (0, 0))
+        assert current.claim(key)
+
+        stale.release(key)
+        assert os.path.exists(current.lock_path(key))
+        assert not third.claim(key)
+
+        current.release(key)
+        assert third.claim(key)
+
+
+# noinspection PyClassHasNoInit
+class TestCachedDownloads:
+    def test_image_hits_skip_requests(self, tmp_path):
+        client = RecordingClient()
+        parser = ImageParser(client, blob_cache=BlobCache(str(tmp_path), max_bytes=2 ** 20))
+        first = parser.get_images(['cosmo1', 'cosmo2'], 'file', 'document')
+        assert [img.img_id for img in first] == ['cosmo1', 'cosmo2'] and len(client.urls) == 3
+
+        client.urls = []
+        second = parser.get_images(['cosmo2', 'cosmo1', 'cosmo3'], 'file', 'document')
+        assert [img.img_id for img in second] == ['cosmo2', 'cosmo1', 'cosmo3']
+        assert second[1] == first[0] and second[0] == first[1]
+        assert len(client.urls) == 2 and client.urls[0].endswith('renderdata?id=file')
+
+    def test_drawing_hits_skip_requests(self, tmp_path):
+        client = RecordingClient()
+        parser = DrawingsParser(client, blob_cache=BlobCache(str(tmp_path), max_bytes=2 ** 20))
+        drawings = [gsuite.Drawing('d1', 100.0, 50.0), gsuite.Drawing('d2', 10.0, 10.0)]
+        first = parser.get_drawings(drawings, 'drawings')
+        assert len(first) == 2 and len(client.urls) == 2
+
+        client.urls = []
+        resized = gsuite.Drawing('d1', 200.0, 50.0)
+        second = parser.get_drawings(drawings + [resized], 'drawings')
+        assert second[:2] == first and len(client.urls) == 1
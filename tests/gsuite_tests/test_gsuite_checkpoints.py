@@ -0,0 +1,24 @@
+import os
+
+from gsuite.docshandler import CHANGELOG_HEADER, REV_INDEX, PlaintextParser
+
+
+def text_by_full_replay(flat_log, rev):
+    changelog = flat_log.index(CHANGELOG_HEADER)
+    lines = flat_log[:changelog + 1] + [line for line in flat_log[changelog + 1:] if line.info[REV_INDEX] <= rev]
+    return PlaintextParser.get_plain_text(lines)
+
+
+# noinspection PyClassHasNoInit
+class TestRevisionReplay:
+    def test_text_at_matches_full_replay(self, flat_log):
+        replay = PlaintextParser.replay_revisions(flat_log, interval=7)
+        last_rev = flat_log[-1].info[REV_INDEX]
+        assert replay.text == PlaintextParser.get_plain_text(flat_log)
+        for rev in range(0, last_rev + 2):
+            assert replay.text_at(rev) == text_by_full_replay(flat_log, rev)
+
+    def test_disk_checkpoints(self, flat_log, tmp_path):
+        replay = PlaintextParser.replay_revisions(flat_log, interval=10, checkpoint_dir=str(tmp_path))
+        assert len(os.listdir(str(tmp_path))) > 1
+        assert replay.text_at(40) == text_by_full_replay(flat_log, 40)
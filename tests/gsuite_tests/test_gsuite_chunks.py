@@ -0,0 +1,103 @@
+import json
+import logging
+import random
+import threading
+import time
+
+import gsuite
+from gsuite import driver
+from gsuite.driver import GSuiteDriver, adapt_chunk_size
+from gsuite.gapiclient import Client
+from gsuite.logcache import LogCache
+
+
+class ChunkClient(object):
+    """ Serves each requested revision range of a synthetic log after a random delay, recording the ranges """
+
+    HttpError = Client.HttpError
+    create_log_url = staticmethod(Client.create_log_url)
+
+    def __init__(self):
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def request(self, url, **kwargs):
+        params = dict(param.split('=') for param in url.split('?')[1].split('&'))
+        start, end = int(params['start']), int(params['end'])
+        with self.lock:
+            self.ranges.append((start, end))
+        time.sleep(0.005 * random.random())  # finish out of order
+        log = {'chunkedSnapshot': [[{'snapshot': start}]],
+               'changelog': [[{'ty': 'is'}, rev, 'uid', rev, 'sid', rev, None] for rev in range(start, end + 1)]}
+        return {'status': '200'}, (gsuite.LOG_START_CHR + json.dumps(log)).encode()
+
+
+def make_driver(tmp_path):
+    gsuite_driver = object.__new__(GSuiteDriver)
+    gsuite_driver._logger = logging.getLogger(__name__)
+    gsuite_driver.client = ChunkClient()
+    gsuite_driver.choice = gsuite.FileChoice('file', 'title', 'document', 5000)
+    gsuite_driver.stream_log = False
+    gsuite_driver.log_cache = LogCache(str(tmp_path), max_bytes=2 ** 30)
+    gsuite_driver.log_headers = lambda: None
+    gsuite_driver.init_parser = lambda: None
+    return gsuite_driver
+
+
+# noinspection PyClassHasNoInit
+class TestDownloadChunks:
+    def test_stitches_chunks_in_order(self, tmp_path):
+        gsuite_driver = make_driver(tmp_path)
+        log = gsuite_driver.get_log(1, 5000)
+        assert [entry[3] for entry in log['changelog']] == list(range(1, 5001))
+        assert log['chunkedSnapshot'] == [[{'snapshot': 1}]]
+        assert len(gsuite_driver.client.ranges) > 1
+
+    def test_probe_chunk_first(self, tmp_path):
+        gsuite_driver = make_driver(tmp_path)
+        original = driver.adapt_chunk_size
+        sizes = []
+
+        def record(chunk_size, *args):
+            sizes.append(len(gsuite_driver.client.ranges))
+            return original(chunk_size, *args)
+
+        driver.adapt_chunk_size = record
+        try:
+            gsuite_driver.download_chunks(1, 5000, gsuite_driver.choice)
+        finally:
+            driver.adapt_chunk_size = original
+        # the probe is measured before any other chunk is requested, and later chunks are sized from it
+        assert sizes[0] == 1
+        assert gsuite_driver.client.ranges[0] == (1, gsuite.LOG_CHUNK_REVS)
+        assert gsuite_driver.client.ranges[1][1] - gsuite_driver.client.ranges[1][0] + 1 != gsuite.LOG_CHUNK_REVS
+
+    def test_small_range_single_request(self, tmp_path):
+        gsuite_driver = make_driver(tmp_path)
+        segments = gsuite_driver.download_chunks(1, 10, gsuite_driver.choice)
+        assert len(segments) == 1 and gsuite_driver.client.ranges == [(1, 10)]
+
+    def test_extends_cached_log(self, tmp_path):
+        gsuite_driver = make_driver(tmp_path)
+        gsuite_driver.get_log(1, 3000)
+        gsuite_driver.client.ranges = []
+        log = gsuite_driver.get_log(1, 3200)
+        assert gsuite_driver.client.ranges == [(3001, 3200)]
+        assert [entry[3] for entry in log['changelog']] == list(range(1, 3201))
+
+
+# noinspection PyClassHasNoInit
+class TestAdaptChunkSize:
+    def test_grows_when_fast_and_small(self):
+        assert adapt_chunk_size(500, 500, 1000, 0.1) > 500
+
+    def test_shrinks_when_slow(self):
+        assert adapt_chunk_size(500, 500, 1000, 100) < 500
+
+    def test_shrinks_when_large(self):
+        assert adapt_chunk_size(500, 500, gsuite.LOG_CHUNK_BYTES * 4, 0.1) < 500
+
+    def test_bounds(self):
+        low, high = gsuite.LOG_CHUNK_BOUNDS
+        assert adapt_chunk_size(low, low, gsuite.LOG_CHUNK_BYTES * 1000, 1000) == low
+        assert adapt_chunk_size(high, high, 1, 0.001) == high
@@ -0,0 +1,45 @@
+import json
+
+import gsuite
+from baseclass import Handler
+from gsuite.docshandler import DocObjects
+
+
+def element_line(elem_dict):
+    return Handler.FlatRecord(('1', '0', 'uid'), 'multiset', {'type': 'ae', 'epm': {'ee_eo': elem_dict}})
+
+
+# noinspection PyClassHasNoInit
+class TestDocObjects:
+    def test_drawings_keep_order_and_largest_size(self):
+        doc_objects = DocObjects()
+        doc_objects(element_line({'d_id': 'b', 'img_wth': '10', 'img_ht': '40'}))
+        doc_objects(element_line({'d_id': 'a', 'img_wth': '5', 'img_ht': '5'}))
+        doc_objects(element_line({'d_id': 'b', 'img_wth': '30', 'img_ht': '20'}))
+        doc_objects(element_line({'d_id': 'a'}))
+        assert doc_objects.drawing_ids == [gsuite.Drawing('b', 30, 20), gsuite.Drawing('a', 5, 5)]
+
+    def test_drawing_size_from_one_occurrence(self):
+        doc_objects = DocObjects()
+        doc_objects(element_line({'d_id': 'd', 'img_wth': '20', 'img_ht': '40'}))
+        doc_objects(element_line({'d_id': 'd', 'img_wth': '100', 'img_ht': '10'}))
+        doc_objects(element_line({'d_id': 'd', 'img_wth': '50', 'img_ht': '20'}))
+        assert doc_objects.drawing_ids == [gsuite.Drawing('d', 100, 10)]
+
+    def test_images(self):
+        doc_objects = DocObjects()
+        doc_objects(element_line({'img_cosmoId': 'x'}))
+        doc_objects(element_line({'img_cosmoId': 'b'}))
+        doc_objects(element_line({'img_cosmoId': 'x'}))
+        doc_objects(element_line({'img_cosmoId': 'a'}))
+        assert doc_objects.image_ids == ['x', 'b', 'a']
+        assert doc_objects.drawing_ids == []
+
+    def test_state_keeps_image_order(self):
+        doc_objects = DocObjects()
+        for img_id in ('x', 'b', 'a'):
+            doc_objects(element_line({'img_cosmoId': img_id}))
+        state = json.loads(json.dumps(doc_objects.state()))
+        restored = DocObjects.from_state(state)
+        restored(element_line({'img_cosmoId': 'c'}))
+        assert restored.image_ids == ['x', 'b', 'a', 'c']
@@ -96,11 +96,6 @@ class TestDocsParser:
         # assert_equal(expected, docs_parser.get_snapshot_line(snapshot_entry))
         raise SkipTest  # TODO: implement your test here
 
-    def test_has_drawing(self):
-        # docs_parser = DocsHandler(client, KumoObj, delimiter)
-        # assert_equal(expected, docs_parser.has_drawing(elem_dict, drawing_ids))
-        raise SkipTest  # TODO: implement your test here
-
     def test_has_element(self):
         # docs_parser = DocsHandler(client, KumoObj, delimiter)
         # assert_equal(expected, docs_parser.has_element(line_dict))
@@ -0,0 +1,74 @@
+import copy
+import json
+
+from gsuite.docshandler import REV_INDEX, DocsHandler
+
+
+def nested_mts(depth):
+    entry = {'ty': 'is', 's': str(depth), 'ibi': depth}
+    for i in range(depth):
+        entry = {'ty': 'mlti', 'mts': [{'ty': 'ds', 'si': i, 'ei': i}, entry]}
+    return entry
+
+
+# noinspection PyClassHasNoInit
+class TestFlattenMts:
+    def test_order(self):
+        handler = DocsHandler(client=None, parsers=[])
+        entry = {'ty': 'mlti', 'mts': [{'ty': 'is', 's': 'a', 'ibi': 1},
+                                       {'ty': 'mlti', 'mts': [{'ty': 'ds', 'si': 1, 'ei': 1}]},
+                                       {'ty': 'is', 's': 'b', 'ibi': 1}]}
+        info = (2, 1000, 'uid')
+        records = list(handler.flatten_mts(entry, info))
+        assert [record.action_type for record in records] == ['ins', 'del', 'ins']
+        assert [record.action.get('string') for record in records] == ['a', None, 'b']
+        assert all(record.info is info for record in records)
+
+    def test_deep_nesting(self):
+        handler = DocsHandler(client=None, parsers=[])
+        records = list(handler.flatten_mts(nested_mts(5000), ()))
+        assert len(records) == 5001
+        assert records[0].action == {'type': 'ds', 'start_index': 4999, 'end_index': 4999}
+        assert records[-1].action['string'] == '5000'
+
+
+# noinspection PyClassHasNoInit
+class TestResumeFlatLog:
+    @staticmethod
+    def saved_state(log, cached_end):
+        """ Returns the state that an earlier run over the revisions up to cached_end would have saved """
+        partial_log = dict(log, changelog=[entry for entry in log['changelog'] if entry[REV_INDEX + 1] <= cached_end])
+        handler = DocsHandler(client=None, parsers=[])
+        partial_flat_log = handler.flatten_log(copy.deepcopy(partial_log))
+        handler.get_doc_objects(partial_flat_log)
+        return json.loads(json.dumps(handler.flat_log_state(partial_flat_log)))
+
+    def test_matches_full_flatten(self, sample_log):
+        log = sample_log
+        cached_end = 40
+        state = self.saved_state(log, cached_end)
+
+        expected_handler = DocsHandler(client=None, parsers=[])
+        expected = expected_handler.flatten_log(copy.deepcopy(log))
+        expected_objects = expected_handler.get_doc_objects(expected)
+
+        resumed_handler = DocsHandler(client=None, parsers=[])
+        resumed = resumed_handler.resume_flat_log(copy.deepcopy(log), state, cached_end)
+        assert resumed == expected
+        assert resumed_handler.visitor(log, None) is None
+        resumed_objects = resumed_handler.get_doc_objects(resumed)
+        assert resumed_objects[:2] == expected_objects[:2]
+        assert resumed_objects[2].content == expected_objects[2].content
+
+    def test_written_log_matches_full_flatten(self, sample_log):
+        log = sample_log
+        # the text before the first revision, as in the log of a later start revision
+        log['chunkedSnapshot'][0].insert(0, {'ty': 'is', 'ibi': 1, 's': 'Before\nstart'})
+        state = self.saved_state(log, 40)
+
+        full_log, resumed_log = copy.deepcopy(log), copy.deepcopy(log)
+        handler = DocsHandler(client=None, parsers=[])
+        full = handler.LogParser(None).parse(full_log, handler.flatten_log(full_log), None)
+        handler = DocsHandler(client=None, parsers=[])
+        resumed = handler.LogParser(None).parse(resumed_log, handler.resume_flat_log(resumed_log, state, 40), None)
+        assert resumed[0].content == full[0].content
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from gsuite.gapiclient import HttpPool
+
+
+class FakeHttp(object):
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.in_use = False
+
+
+# noinspection PyClassHasNoInit
+class TestHttpPool:
+    def test_reuses_connection(self):
+        pool = HttpPool(FakeHttp, size=2)
+        with pool.connection() as first:
+            pass
+        with pool.connection() as second:
+            assert second is first
+        with pool.connection(timeout=5) as third:
+            assert third is not first and third.timeout == 5
+
+    def test_discards_failed_connection(self):
+        pool = HttpPool(FakeHttp, size=2)
+        kept = dropped = None
+        try:
+            with pool.connection(keep_on=KeyError) as kept:
+                raise KeyError()
+        except KeyError:
+            pass
+        try:
+            with pool.connection(keep_on=KeyError) as dropped:
+                assert dropped is kept
+                raise IOError()
+        except IOError:
+            pass
+        with pool.connection() as http:
+            assert http is not dropped
+
+    def test_bounded_and_exclusive(self):
+        created, lock = [], threading.Lock()
+
+        def factory(timeout):
+            with lock:
+                created.append(FakeHttp(timeout))
+                return created[-1]
+
+        pool = HttpPool(factory, size=3)
+
+        def use(_):
+            with pool.connection() as http:
+                assert not http.in_use
+                http.in_use = True
+                time.sleep(0.001)
+                http.in_use = False
+
+        with ThreadPoolExecutor(max_workers=10) as executor:
+            list(executor.map(use, range(200)))
+        assert 1 <= len(created) <= 3
+
+    def test_idle_bounded_across_timeouts(self):
+        pool = HttpPool(FakeHttp, size=2)
+        returned = []
+        for timeout in (None, 5, 10, 5):
+            with pool.connection(timeout=timeout) as http:
+                returned.append(http)
+        # returned[3] reused returned[1], and the idle None connection is dropped as the oldest
+        assert returned[3] is returned[1]
+        assert len(pool._idle) == 2
+        with pool.connection(timeout=10) as http:
+            assert http is returned[2]
+        with pool.connection(timeout=None) as http:
+            assert http is not returned[0]
+        assert len(pool._idle) == 2
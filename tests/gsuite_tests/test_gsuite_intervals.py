@@ -0,0 +1,37 @@
+import random
+
+from gsuite.intervals import IntervalIndex
+
+
+# noinspection PyClassHasNoInit
+class TestIntervalIndex:
+    def test_find(self):
+        index = IntervalIndex()
+        index.set('a', 1, 5)
+        index.set('b', 3, 8)
+        index.set('c', 10, 12)
+        assert index.find(4) == ['a', 'b']
+        assert index.find(9) == []
+        assert index.find(12) == ['c']
+
+    def test_set_keeps_order(self):
+        index = IntervalIndex()
+        index.set('a', 5, 6)
+        index.set('b', 1, 10)
+        index.set('a', 0, 20)
+        assert index.find(5) == ['a', 'b']
+        index.remove('a')
+        assert index.find(5) == ['b']
+        assert 'a' not in index
+
+    def test_matches_scan(self):
+        rand = random.Random(0)
+        index, intervals = IntervalIndex(), {}
+        for _ in range(2000):
+            ident = rand.randint(0, 50)
+            start = rand.randint(0, 100)
+            end = start + rand.randint(-1, 10)
+            intervals[ident] = (start, end)
+            index.set(ident, start, end)
+            point = rand.randint(0, 110)
+            assert index.find(point) == [i for i, (s, e) in intervals.items() if s <= point <= e]
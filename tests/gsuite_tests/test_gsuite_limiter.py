@@ -0,0 +1,92 @@
+import threading
+import time
+
+import googleapiclient.errors
+import httplib2
+import pytest
+
+from gsuite.gapiclient import ConcurrencyLimiter
+
+
+def http_error(status):
+    return googleapiclient.errors.HttpError(httplib2.Response({'status': str(status)}), b'')
+
+
+def throttled(limiter):
+    with pytest.raises(googleapiclient.errors.HttpError):
+        with limiter.slot():
+            raise http_error(429)
+
+
+# noinspection PyClassHasNoInit
+class TestConcurrencyLimiter:
+    def test_additive_increase(self):
+        limiter = ConcurrencyLimiter(initial=2, limits=(1, 4))
+        for _ in range(3):
+            with limiter.slot():
+                pass
+        assert int(limiter.limit) == 3
+        for _ in range(100):
+            with limiter.slot():
+                pass
+        assert limiter.limit == 4
+
+    def test_multiplicative_decrease(self):
+        limiter = ConcurrencyLimiter(initial=8, limits=(1, 16))
+        throttled(limiter)
+        assert limiter.limit == 4
+        for _ in range(5):
+            throttled(limiter)
+        assert limiter.limit == 1
+
+    def test_other_errors_keep_cap(self):
+        limiter = ConcurrencyLimiter(initial=4, limits=(1, 16))
+        with pytest.raises(IOError):
+            with limiter.slot():
+                raise IOError('reset')
+        assert limiter.limit == 4
+        with pytest.raises(googleapiclient.errors.HttpError):
+            with limiter.slot():
+                raise http_error(404)
+        assert limiter.limit > 4
+
+    def test_burst_cuts_once(self):
+        limiter = ConcurrencyLimiter(initial=4, limits=(1, 16))
+        started, release = threading.Barrier(4), threading.Event()
+
+        def worker():
+            try:
+                with limiter.slot():
+                    started.wait()
+                    release.wait()
+                    raise http_error(503)
+            except googleapiclient.errors.HttpError:
+                pass
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert limiter.limit == 2
+
+    def test_caps_in_flight(self):
+        limiter = ConcurrencyLimiter(initial=2, limits=(2, 2))
+        peak, lock, active = [0], threading.Lock(), [0]
+
+        def worker():
+            with limiter.slot():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.01)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert peak[0] == 2 and limiter.in_flight == 0
@@ -0,0 +1,33 @@
+import os
+
+from gsuite.logcache import LogCache
+
+
+# noinspection PyClassHasNoInit
+class TestLogCache:
+    def test_get_missing(self, tmp_path):
+        cache = LogCache(str(tmp_path), max_bytes=2 ** 20)
+        assert cache.get('file', 'document', 1, 10) is None
+
+    def test_put_get(self, tmp_path):
+        cache = LogCache(str(tmp_path), max_bytes=2 ** 20)
+        cache.put('{"changelog": []}', 'file', 'document', 1, 10)
+        assert cache.get('file', 'document', 1, 10) == '{"changelog": []}'
+        assert cache.get('file', 'document', 1, 11) is None
+
+    def test_evict(self, tmp_path):
+        cache = LogCache(str(tmp_path), max_bytes=1)
+        cache.put('first', 'file', 'document', 1, 1)
+        os.utime(cache.path('file', 'document', 1, 1), (0, 0))
+        cache.put('second', 'file', 'document', 1, 2)
+        assert cache.get('file', 'document', 1, 1) is None
+        assert cache.get('file', 'document', 1, 2) == 'second'
+
+    def test_latest(self, tmp_path):
+        cache = LogCache(str(tmp_path), max_bytes=2 ** 20)
+        assert cache.latest('file', 'document', 1, 10) == (None, None)
+        cache.put('five', 'file', 'document', 1, 5)
+        cache.put('seven', 'file', 'document', 1, 7)
+        cache.put('other', 'file', 'document', 2, 8)
+        cache.put('later', 'file', 'document', 1, 12)
+        assert cache.latest('file', 'document', 1, 10) == (7, 'seven')
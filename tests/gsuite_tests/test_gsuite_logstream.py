@@ -0,0 +1,40 @@
+import io
+import json
+
+import gsuite
+from baseclass import Handler
+from gsuite.logstream import StreamedLog
+
+LOG = {'changelog': [[{'ty': 'is', 's': 'a'}, 1, 'uid', 1], [{'ty': 'is', 's': 'b'}, 2, 'uid', 2]],
+       'chunkedSnapshot': [[{'si': 0, 'ei': 1, 'st': 'text', 'ty': 'as', 'sm': {}}]]}
+
+
+# noinspection PyClassHasNoInit
+class TestStreamedLog:
+    def test_skips_prefix(self):
+        log = StreamedLog([(gsuite.LOG_START_CHR + json.dumps(LOG), len(gsuite.LOG_START_CHR))])
+        assert log['chunkedSnapshot'] == LOG['chunkedSnapshot']
+        assert list(log['changelog']) == LOG['changelog']
+        assert log.load() == LOG
+
+    def test_segments(self):
+        first = dict(LOG, changelog=LOG['changelog'][:1])
+        second = {'chunkedSnapshot': [[]], 'changelog': LOG['changelog'][1:]}
+        log = StreamedLog([(json.dumps(first), 0), (json.dumps(second), 0)])
+        assert list(log['changelog']) == LOG['changelog']
+        assert log['chunkedSnapshot'] == LOG['chunkedSnapshot']
+        assert log.load() == LOG
+
+        f = io.StringIO()
+        log.dump(f)
+        assert json.loads(f.getvalue()) == LOG
+
+    def test_dump_indented(self):
+        first = dict(LOG, changelog=LOG['changelog'][:1])
+        second = {'chunkedSnapshot': [[]], 'changelog': LOG['changelog'][1:]}
+        for segments in ([(json.dumps(LOG), 0)], [(json.dumps(first), 0), (json.dumps(second), 0)],
+                         [(json.dumps({'changelog': []}), 0)]):
+            f = io.StringIO()
+            log = StreamedLog(segments)
+            log.dump(f, indent=1)
+            assert f.getvalue() == Handler.stringify(log.load())
@@ -0,0 +1,52 @@
+import random
+
+from gsuite.docshandler import insert, delete
+from gsuite.piecetable import PieceTable
+
+
+# noinspection PyClassHasNoInit
+class TestPieceTable:
+    def test_insert(self):
+        table = PieceTable('hed')
+        table.insert(2, 'llo worl')
+        table.insert(0, '')
+        table.insert(100, '!')
+        assert table.getvalue() == 'hello world!'
+        assert len(table) == len('hello world!')
+
+    def test_delete(self):
+        table = PieceTable('hello world')
+        table.delete(5, 11)
+        assert str(table) == 'hello'
+
+    def test_slice(self):
+        table = PieceTable('hello')
+        table.insert(5, ' world')
+        assert table.slice(3, 8) == 'lo wo'
+        assert str(table) == 'hello world'
+
+    def test_matches_string_functions(self):
+        rand = random.Random(0)
+        text, table = '', PieceTable()
+        for _ in range(2000):
+            if rand.random() < 0.6:
+                new = ''.join(rand.choice('abc\n') for _ in range(rand.randint(0, 4)))
+                i = rand.randint(-3, len(text) + 3)
+                text = insert(text, new, i, index_offset=0)
+                table.insert(i, new)
+            else:
+                si, ei = rand.randint(-3, len(text) + 3), rand.randint(-3, len(text) + 3)
+                text = delete(text, si, ei, index_offset=0)
+                table.delete(si, ei)
+            assert str(table) == text
+
+    def test_spans(self):
+        table = PieceTable('abc', tag='a')
+        table.insert(1, 'xy', tag='b')
+        table.insert(3, 'z', tag='b')
+        table.delete(0, 1)
+        assert str(table) == 'xyzbc'
+        assert list(table.spans()) == [(0, 3, 'b'), (3, 5, 'a')]
+        table.delete(5, 3)
+        assert str(table) == 'xyzbcbc'
+        assert list(table.spans()) == [(0, 3, 'b'), (3, 7, 'a')]
@@ -0,0 +1,74 @@
+import socket
+
+import httplib2
+
+from gsuite.gapiclient import Client, ConcurrencyLimiter, HttpPool, RetryPolicy
+
+
+class ScriptedHttp(object):
+    """ Returns each (status, headers) of script in turn, or raises it if it is an exception """
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.calls = 0
+
+    def request(self, url, **kwargs):
+        self.calls += 1
+        item = self.script.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        status, headers = item
+        return httplib2.Response(dict(headers, status=str(status))), b'content'
+
+
+def make_client(script, **policy_args):
+    http = ScriptedHttp(script)
+    client = object.__new__(Client)
+    client.http_pool = HttpPool(lambda timeout: http, size=1)
+    sleeps = []
+    client.retry_policy = RetryPolicy(sleep=sleeps.append, **policy_args)
+    client.limiter = ConcurrencyLimiter()
+    return client, http, sleeps
+
+
+# noinspection PyClassHasNoInit
+class TestRetryPolicy:
+    def test_retries_transient_errors(self):
+        client, http, sleeps = make_client([(503, {}), IOError('reset'), (200, {})])
+        response, content = client.request('url')
+        assert response.status == 200 and content == b'content'
+        assert http.calls == 3 and len(sleeps) == 2
+
+    def test_honors_retry_after(self):
+        client, http, sleeps = make_client([(429, {'retry-after': '7'}), (200, {})])
+        client.request('url')
+        assert sleeps == [7.0]
+
+    def test_gives_up(self):
+        for script, args, calls in (([(404, {})], {}, 1),
+                                    ([(500, {})] * 4, {'attempts': 3}, 4),
+                                    ([(500, {})] * 3, {'budget': 2}, 3),
+                                    ([(429, {'retry-after': '600'})], {}, 1)):
+            client, http, _ = make_client(script, **args)
+            try:
+                client.request('url')
+            except Client.HttpError:
+                pass
+            else:
+                assert False, 'expected HttpError'
+            assert http.calls == calls
+
+    def test_backoff_grows_within_bounds(self):
+        policy = RetryPolicy(delay=(1, 8))
+        for attempt in range(6):
+            assert 0 <= policy.backoff(attempt, IOError()) <= min(8, 2 ** attempt)
+
+    def test_timeouts_not_retried(self):
+        client, http, sleeps = make_client([socket.timeout('timed out'), (200, {})])
+        try:
+            client.request('url', timeout=1)
+        except socket.timeout:
+            pass
+        else:
+            assert False, 'expected timeout'
+        assert http.calls == 1 and sleeps == []
@@ -0,0 +1,51 @@
+import io
+
+from gsuite.docshandler import DocsHandler, PlaintextParser, RevisionsParser
+from gsuite.revisions import BASE_FILENAME, DIFF_FILENAME, RevisionHistory
+
+
+# noinspection PyClassHasNoInit
+class TestRevisionHistory:
+    def test_matches_replay(self, flat_log):
+        objects = {obj.filename: obj.content for obj in RevisionsParser(None).parse(None, flat_log, None)}
+        base_text = io.StringIO()
+        objects[BASE_FILENAME](base_text)
+        history = RevisionHistory(base_text.getvalue(), objects[DIFF_FILENAME].decode('utf-8').split('\n'))
+        replay = PlaintextParser.replay_revisions(flat_log)
+
+        assert history.revs == sorted(set(history.revs))
+        for rev, text in history:
+            assert text == replay.text_at(rev)
+            assert history.text_at(rev) == text
+        assert history.text_at(history.revs[-1]) == PlaintextParser.get_plain_text(flat_log)
+
+    def test_load(self, tmp_path):
+        (tmp_path / BASE_FILENAME).write_text(u'hello', encoding='utf-8')
+        (tmp_path / DIFF_FILENAME).write_text(u'[2, [[5, " world"]]]\n[3, [[0, 6]]]', encoding='utf-8')
+        history = RevisionHistory.load(str(tmp_path))
+        assert history.text_at(1) == 'hello'
+        assert history.text_at(2) == 'hello world'
+        assert list(history) == [(2, 'hello world'), (3, 'world')]
+
+    def test_write_and_load_keep_carriage_returns(self, tmp_path):
+        log = {'chunkedSnapshot': [[{'ty': 'is', 'ibi': 1, 's': 'a\rb'}]],
+               'changelog': [[{'ty': 'is', 'ibi': 4, 's': '\r\nc'}, 1000, 'uid', 2, 'sid', 1]]}
+        handler = DocsHandler(client=None, parsers=[])
+        flat_log = handler.flatten_log(log)
+        for obj in RevisionsParser(None).parse(None, flat_log, None):
+            # as Driver.write_object writes each kind of content
+            if callable(obj.content):
+                with io.open(str(tmp_path / obj.filename), 'w', encoding='utf-8', newline='') as f:
+                    obj.content(f)
+            else:
+                (tmp_path / obj.filename).write_bytes(obj.content)
+        history = RevisionHistory.load(str(tmp_path))
+        assert history.text_at(1) == 'a\rb'
+        assert history.text_at(2) == 'a\rb\r\nc'
+
+    def test_opt_in(self):
+        handler = DocsHandler(client=None)
+        assert not any(isinstance(parser, RevisionsParser) for parser in handler.parsers)
+        handler.enable_parsers({'revisions'})
+        handler.enable_parsers({'revisions'})
+        assert sum(isinstance(parser, RevisionsParser) for parser in handler.parsers) == 1
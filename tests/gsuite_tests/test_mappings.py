@@ -0,0 +1,18 @@
+import mappings
+
+
+# noinspection PyClassHasNoInit
+class TestRemapKeys:
+    def test_nested(self):
+        log_dict = {'ty': 'is', 'ibi': 3, 'unknown': 1, 'sm': {'ts_bd': True, 'ts_bd_i': False}}
+        expected = {'type': 'is', 'ins_index': 3, 'unknown': 1, 'style_mod': {'bold': True, 'bold_i': False}}
+        renamed = mappings.remap_keys(log_dict)
+        assert renamed == expected
+        assert list(renamed) == list(expected)
+        assert list(renamed['style_mod']) == ['bold', 'bold_i']
+
+    def test_does_not_modify_input(self):
+        log_dict = {'ty': 'ds', 'si': 1, 'ei': 2}
+        mappings.remap_keys(log_dict)
+        mappings.remap_keys(log_dict)
+        assert log_dict == {'ty': 'ds', 'si': 1, 'ei': 2}
@@ -0,0 +1,28 @@
+import json
+
+from benchmarks import synthetic
+from gsuite.docshandler import DocsHandler, PlaintextParser
+from gsuite.slideshandler import Presentation
+
+
+# noinspection PyClassHasNoInit
+class TestSyntheticLogs:
+    def test_docs_log(self):
+        generator = synthetic.DocsLogGenerator(revisions=2000, mts_depth=3, suggestion_rate=0.2, seed=1)
+        log = generator.generate()
+        assert log == synthetic.docs_log(revisions=2000, mts_depth=3, suggestion_rate=0.2, seed=1)
+
+        handler = DocsHandler(client=None)
+        flat_log = handler.flatten_log(json.loads(json.dumps(log)))
+        # parse_snapshot escapes each newline of the snapshot text as two characters
+        escaped = log['chunkedSnapshot'][0][0]['s'].count('\n')
+        assert len(PlaintextParser.get_plain_text(flat_log)) == generator.length + escaped
+        image_ids, drawing_ids, suggestions = handler.get_doc_objects(flat_log)
+        assert image_ids and drawing_ids
+        assert json.loads(suggestions.content)
+
+    def test_slides_log(self):
+        generator = synthetic.SlidesLogGenerator(revisions=2000, seed=1)
+        presentation = Presentation(generator.generate())
+        assert presentation.slide_list == generator.slides
+        assert {box: len(attrib['string']) for box, attrib in presentation.box_dict.items()} == generator.boxes